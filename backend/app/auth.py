@@ -1,3 +1,7 @@
+import asyncio
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
 from typing import Optional
 
@@ -5,8 +9,10 @@ from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.cache import TTLCache
 from app.config import settings
 from app.database import get_db
 from app.models import User
@@ -14,10 +20,27 @@ from app.models import User
 pwd_context = CryptContext(
     schemes=["bcrypt"], 
     deprecated="auto",
-    truncate_error=False
+    truncate_error=False,
+    bcrypt__rounds=settings.BCRYPT_ROUNDS,
 )
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/login")
 
+# Cache de usuários conhecidos, indexado por id. Guarda a versão do token
+# vigente para que a maioria das requisições não precise consultar `users`.
+_user_cache = TTLCache(maxsize=settings.USER_CACHE_SIZE, ttl=settings.USER_CACHE_TTL_SECONDS)
+
+
+@dataclass(frozen=True)
+class Principal:
+    id: int
+    name: str
+    email: str
+    token_version: int
+
+    @classmethod
+    def from_user(cls, user: User) -> "Principal":
+        return cls(id=user.id, name=user.name, email=user.email, token_version=user.token_version)
+
 
 def hash_password(password: str) -> str:
     return pwd_context.hash(password)
@@ -27,17 +50,105 @@ def verify_password(plain: str, hashed: str) -> bool:
     return pwd_context.verify(plain, hashed)
 
 
+def verify_and_update_password(plain: str, hashed: str) -> tuple[bool, Optional[str]]:
+    # Devolve um novo hash quando o atual usa um custo diferente do configurado
+    return pwd_context.verify_and_update(plain, hashed)
+
+
+# ── Pool dedicado para bcrypt ────────────────────────────
+# bcrypt é CPU-bound de propósito. O pool limita quantos hashes rodam em
+# paralelo e a fila limita quantos esperam; acima disso a requisição é
+# recusada com 503 em vez de atrasar todas as outras.
+class PasswordHasherBusy(Exception):
+    pass
+
+
+class PasswordHasher:
+    def __init__(self, workers: int, queue_size: int, executor: str = "thread"):
+        self.workers = workers
+        self.max_pending = workers + queue_size
+        self.executor_kind = executor
+        self._executor = None
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        if self._executor is None:
+            if self.executor_kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+        return self._executor
+
+    async def run(self, fn, *args):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise PasswordHasherBusy()
+            self._pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), fn, *args)
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+
+password_hasher = PasswordHasher(
+    workers=settings.PASSWORD_HASH_WORKERS,
+    queue_size=settings.PASSWORD_HASH_QUEUE_SIZE,
+    executor=settings.PASSWORD_HASH_EXECUTOR,
+)
+
+
+async def _run_password_job(fn, *args):
+    try:
+        return await password_hasher.run(fn, *args)
+    except PasswordHasherBusy:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Servidor ocupado, tente novamente em instantes",
+            headers={"Retry-After": "1"},
+        )
+
+
+async def hash_password_async(password: str) -> str:
+    return await _run_password_job(hash_password, password)
+
+
+async def verify_and_update_password_async(plain: str, hashed: str) -> tuple[bool, Optional[str]]:
+    return await _run_password_job(verify_and_update_password, plain, hashed)
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
     if "sub" in to_encode:
         to_encode["sub"] = str(to_encode["sub"])
+    # jose rejeita o token depois de `exp` no decode
+    expires = expires_delta or timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    to_encode["exp"] = datetime.now(timezone.utc) + expires
     return jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
 
 
-def get_current_user(
+def token_claims(user: User) -> dict:
+    # Nome e e-mail vêm da linha em cache; no token só o que a validação usa
+    return {"sub": user.id, "ver": user.token_version}
+
+
+def invalidate_user_cache(user_id: int) -> None:
+    # Chamar sempre que `token_version` do usuário mudar. Vale para este processo;
+    # os demais rejeitam os tokens antigos quando a entrada expira (USER_CACHE_TTL_SECONDS)
+    _user_cache.pop(user_id)
+
+
+async def get_current_user(
     token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db),
-) -> User:
+    db: AsyncSession = Depends(get_db),
+) -> Principal:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Credenciais inválidas",
@@ -49,10 +160,28 @@ def get_current_user(
         if token_sub is None:
             raise credentials_exception
         user_id = int(token_sub) # CONVERSÃO EXPLÍCITA PARA INT
+        # Tokens sem `ver` são de antes da revogação (e sem `exp`): não valem mais
+        token_version = payload.get("ver")
+        if token_version is None:
+            raise credentials_exception
+        token_version = int(token_version)
     except (JWTError, ValueError): # Adicione ValueError caso o 'sub' não seja um número
         raise credentials_exception
 
-    user = db.query(User).filter(User.id == user_id).first()
+    # Modo stateless: versão igual à do cache dispensa o banco
+    if settings.AUTH_STATELESS:
+        cached = _user_cache.get(user_id)
+        if cached is not None and cached.token_version == token_version:
+            return cached
+
+    user = await db.scalar(select(User).where(User.id == user_id))
     if user is None:
+        _user_cache.pop(user_id)
+        raise credentials_exception
+
+    principal = Principal.from_user(user)
+    _user_cache.set(user_id, principal)
+    # Token emitido para uma versão anterior foi revogado
+    if token_version != user.token_version:
         raise credentials_exception
-    return user
\ No newline at end of file
+    return principal
\ No newline at end of file
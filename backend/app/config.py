@@ -1,12 +1,118 @@
+import os
+from typing import Optional
+
+from pydantic import Field
 from pydantic_settings import BaseSettings
 
+# Driver assíncrono equivalente a cada driver síncrono suportado
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
 class Settings(BaseSettings):
     DATABASE_URL: str
+    # Opcional; por padrão derivada de DATABASE_URL trocando o driver
+    ASYNC_DATABASE_URL: Optional[str] = None
+    # Pool de conexões (ignorado para SQLite)
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30
+    DB_POOL_RECYCLE: int = 1800  # segundos; -1 desativa
+    DB_POOL_PRE_PING: bool = True
+    DB_STATEMENT_TIMEOUT_MS: int = 0  # 0 = sem limite
+    # PgBouncer (transaction pooling): NullPool e sem prepared statements
+    DB_PGBOUNCER: bool = False
+
     SECRET_KEY: str
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24
 
+    # Autenticação stateless (claims no JWT + cache de usuários)
+    AUTH_STATELESS: bool = True
+    USER_CACHE_SIZE: int = 1024
+    USER_CACHE_TTL_SECONDS: int = 300
+
+    # Hash de senhas (bcrypt)
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_EXECUTOR: str = "thread"  # "thread" | "process"
+    PASSWORD_HASH_WORKERS: int = os.cpu_count() or 2
+    PASSWORD_HASH_QUEUE_SIZE: int = 32
+
+    # Cache de respostas das listagens (por usuário, invalidado nas escritas)
+    RESPONSE_CACHE_ENABLED: bool = True
+    RESPONSE_CACHE_SIZE: int = 1024
+    RESPONSE_CACHE_TTL_SECONDS: int = 300
+    RESPONSE_CACHE_MAX_VARIANTS: int = 8  # filtros guardados por (usuário, coleção)
+    RESPONSE_CACHE_BACKEND: str = ""  # "modulo:fabrica" de um backend compartilhado
+
+    # Previsão de consumo de insumos (suavização exponencial em tempo contínuo).
+    # Meia-vida em dias, de 1 dia a 10 anos
+    FORECAST_HALF_LIFE_DAYS: float = Field(30, ge=1, le=3650)
+    # Ritmo de uso das máquinas (regressão ponderada do horímetro no tempo)
+    MACHINE_USAGE_HALF_LIFE_DAYS: float = Field(180, ge=1, le=3650)
+
+    # Outbox de eventos: worker embutido no app ou processo separado (python -m app.outbox)
+    OUTBOX_EMBEDDED_WORKER: bool = True
+    OUTBOX_BATCH_SIZE: int = 100
+    OUTBOX_POLL_INTERVAL_SECONDS: float = 1.0
+    OUTBOX_MAX_ATTEMPTS: int = 10
+    OUTBOX_RETENTION_HOURS: int = 24
+
+    # Partições mensais de manutenções e movimentações (Postgres; ver app/partitions.py)
+    PARTITION_MAINTENANCE_EMBEDDED: bool = True
+    PARTITION_MAINTENANCE_INTERVAL_SECONDS: float = 3600
+    PARTITION_MONTHS_AHEAD: int = 3
+    PARTITION_RETENTION_MONTHS: int = 0  # 0 = nunca arquiva
+    PARTITION_ARCHIVE_SCHEMA: str = "arquivo"
+
+    # Telemetria do horímetro: leituras acumuladas em memória e gravadas em lote
+    TELEMETRY_FLUSH_INTERVAL_SECONDS: float = 5.0
+    TELEMETRY_FLUSH_BATCH_SIZE: int = 500  # máquinas por UPDATE
+    TELEMETRY_MAX_PENDING: int = 10_000  # antecipa o flush ao passar deste número de máquinas
+
+    # Busca de máquinas e insumos: índice em memória por usuário quando o banco
+    # não tem pg_trgm/unaccent (SQLite)
+    SEARCH_INDEX_CACHE_SIZE: int = 256
+    SEARCH_INDEX_TTL_SECONDS: int = 600
+
+    # Limite de requisições por usuário e rota (balde de fichas; ver app/ratelimit.py)
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_READ_PER_MINUTE: int = 600
+    RATE_LIMIT_READ_BURST: int = 100
+    RATE_LIMIT_WRITE_PER_MINUTE: int = 120
+    RATE_LIMIT_WRITE_BURST: int = 30
+    RATE_LIMIT_LOGIN_PER_MINUTE: int = 10  # por e-mail e por (IP, e-mail), em login e cadastro
+    RATE_LIMIT_LOGIN_BURST: int = 5
+    # Por IP, somando todos os e-mails: folgado porque uma fazenda inteira pode sair
+    # por um único IP (NAT, proxy); aumentar se a equipe receber 429 no login
+    RATE_LIMIT_LOGIN_IP_PER_MINUTE: int = 60
+    RATE_LIMIT_LOGIN_IP_BURST: int = 20
+    RATE_LIMIT_MAX_KEYS: int = 100_000
+    RATE_LIMIT_BACKEND: str = ""  # "modulo:fabrica" de um backend compartilhado
+
+    # Admissão global: requisições simultâneas por processo antes de responder 503
+    ADMISSION_MAX_CONCURRENT: int = 0  # 0 = DB_POOL_SIZE + DB_MAX_OVERFLOW
+    ADMISSION_QUEUE_SIZE: int = 100
+    ADMISSION_QUEUE_TIMEOUT_SECONDS: float = 1.0
+
+    # Instrumentação: Server-Timing, /metrics e alerta de N+1
+    METRICS_ENABLED: bool = True
+    METRICS_QUERY_WARN_THRESHOLD: int = 20  # 0 desativa o alerta
+
     class Config:
         env_file = ".env"
 
+    @property
+    def admission_max_concurrent(self) -> int:
+        return self.ADMISSION_MAX_CONCURRENT or self.DB_POOL_SIZE + self.DB_MAX_OVERFLOW
+
+    @property
+    def async_database_url(self) -> str:
+        if self.ASYNC_DATABASE_URL:
+            return self.ASYNC_DATABASE_URL
+        scheme, sep, rest = self.DATABASE_URL.partition("://")
+        return ASYNC_DRIVERS.get(scheme, scheme) + sep + rest
+
 settings = Settings()
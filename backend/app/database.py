@@ -1,14 +1,125 @@
-from sqlalchemy import create_engine
+import math
+from uuid import uuid4
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool, QueuePool
 
 from app.config import settings
+from app.instrumentation import instrument_queries
+from app.pool import PoolMetrics, instrument_pool, timed_pool_class
+
+sync_pool_metrics = PoolMetrics("sync")
+async_pool_metrics = PoolMetrics("async")
+
+
+def _engine_options(url: str, is_async: bool, metrics: PoolMetrics) -> dict:
+    # SQLite (desenvolvimento/testes) mantém o pool padrão do SQLAlchemy
+    if url.startswith("sqlite"):
+        return {}
+
+    connect_args = {}
+    # Atrás do PgBouncer vale por transação (_set_local_statement_timeout)
+    if settings.DB_STATEMENT_TIMEOUT_MS and not settings.DB_PGBOUNCER:
+        timeout = str(settings.DB_STATEMENT_TIMEOUT_MS)
+        if is_async:
+            connect_args["server_settings"] = {"statement_timeout": timeout}
+        else:
+            connect_args["options"] = f"-c statement_timeout={timeout}"
+
+    if settings.DB_PGBOUNCER:
+        # PgBouncer em modo transaction: o pool fica no PgBouncer e
+        # prepared statements não sobrevivem entre transações
+        if is_async:
+            connect_args.update(
+                statement_cache_size=0,
+                prepared_statement_cache_size=0,
+                prepared_statement_name_func=lambda: f"__asyncpg_{uuid4()}__",
+            )
+        return {
+            "poolclass": timed_pool_class(NullPool, metrics),
+            "connect_args": connect_args,
+        }
+
+    return {
+        "poolclass": timed_pool_class(AsyncAdaptedQueuePool if is_async else QueuePool, metrics),
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        "connect_args": connect_args,
+    }
 
-engine = create_engine(settings.DATABASE_URL)
+
+# Engine síncrono: seeds, scripts e testes
+engine = create_engine(
+    settings.DATABASE_URL,
+    **_engine_options(settings.DATABASE_URL, False, sync_pool_metrics),
+)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# Engine assíncrono (asyncpg / aiosqlite): usado pelas rotas
+async_engine = create_async_engine(
+    settings.async_database_url,
+    **_engine_options(settings.async_database_url, True, async_pool_metrics),
+)
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+
+def _set_local_statement_timeout(conn) -> None:
+    # PgBouncer em modo transaction recusa parâmetros de inicialização (options,
+    # server_settings) e troca a conexão do servidor a cada transação: o limite vai
+    # com SET LOCAL no começo de cada uma, ao custo de uma ida ao banco
+    conn.exec_driver_sql(f"SET LOCAL statement_timeout = {int(settings.DB_STATEMENT_TIMEOUT_MS)}")
+
+
+def _sqlite_math_functions(dbapi_connection, _record) -> None:
+    # exp() só existe no SQLite compilado com as funções matemáticas; o upsert
+    # das previsões (app/forecasting.py) depende dela
+    dbapi_connection.create_function("exp", 1, math.exp, deterministic=True)
+
+
+for _engine in (engine, async_engine.sync_engine):
+    if _engine.dialect.name == "sqlite":
+        event.listen(_engine, "connect", _sqlite_math_functions)
+
+if settings.DB_PGBOUNCER and settings.DB_STATEMENT_TIMEOUT_MS:
+    for _engine in (engine, async_engine.sync_engine):
+        if _engine.dialect.name == "postgresql":
+            event.listen(_engine, "begin", _set_local_statement_timeout)
+
+instrument_pool(engine, sync_pool_metrics)
+instrument_pool(async_engine.sync_engine, async_pool_metrics)
+if settings.METRICS_ENABLED:
+    instrument_queries(engine)
+    instrument_queries(async_engine.sync_engine)
+
 Base = declarative_base()
 
 
-def get_db():
+def pool_stats() -> dict:
+    return {
+        "sync": {"status": engine.pool.status(), **sync_pool_metrics.snapshot()},
+        "async": {"status": async_engine.pool.status(), **async_pool_metrics.snapshot()},
+    }
+
+
+def dialect_insert(bind, table):
+    # INSERT com suporte a ON CONFLICT no dialeto da conexão (Postgres ou SQLite)
+    if bind.dialect.name == "postgresql":
+        return postgresql.insert(table)
+    return sqlite.insert(table)
+
+
+async def get_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def get_sync_db():
     db = SessionLocal()
     try:
         yield db
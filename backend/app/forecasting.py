@@ -0,0 +1,383 @@
+import math
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, Optional
+
+import numpy as np
+from sqlalchemy import Float, case, delete, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import dialect_insert
+from app.models import (
+    SUPPLY_OUT_COLUMNS, Machine, MachineForecast, Maintenance, Movement, MovementType, Supply, SupplyForecast,
+)
+from app.responses import rows_as_dicts
+
+# Suavização exponencial em tempo contínuo: no instante `ref`, uma saída de `q`
+# na data `t` vale q * exp((t - ref) / tau). O estado fica descontado até a
+# última saída (ref), então todo expoente é <= 0: o peso nunca estoura, qualquer
+# que seja a meia-vida. Juntar dois estados é descontar o mais antigo até o mais
+# novo e somar (_merge_decayed e _decayed_upsert)
+SECONDS_PER_DAY = 86400.0
+TAU_SECONDS = settings.FORECAST_HALF_LIFE_DAYS * SECONDS_PER_DAY / math.log(2)
+# Origem do tempo da regressão do ritmo de uso (t em dias desde ela)
+FORECAST_EPOCH = datetime(2020, 1, 1, tzinfo=timezone.utc)
+EPOCH_TS = FORECAST_EPOCH.timestamp()
+# Janela mínima de observação: uma única saída hoje não vira consumo "infinito"
+MIN_WINDOW_SECONDS = SECONDS_PER_DAY
+FORECAST_BATCH_SIZE = 50_000
+# Horizonte da data prevista: além dele a data não diz nada (e estouraria o datetime)
+MAX_HORIZON_DAYS = 3650
+
+
+def as_utc(value: datetime) -> datetime:
+    # SQLite devolve datas sem fuso; são gravadas em UTC
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+
+def epoch_seconds(bind, column):
+    if bind.dialect.name == "postgresql":
+        return func.extract("epoch", column).cast(Float)
+    return (func.julianday(column) - 2440587.5) * SECONDS_PER_DAY
+
+
+def _merge_decayed(total: float, ref: float, value: float, value_ref: float, tau: float) -> tuple[float, float]:
+    # Soma dois estados descontados (referências em segundos), na referência mais nova
+    if value_ref > ref:
+        return total * math.exp((ref - value_ref) / tau) + value, value_ref
+    return total + value * math.exp((value_ref - ref) / tau), ref
+
+
+def _decayed_upsert(bind, table, sums: tuple[str, ...], ref: str, tau: float):
+    # Upsert que junta o estado gravado (descontado até table.ref) com o novo
+    # (descontado até excluded.ref): o mais antigo é descontado até o mais novo.
+    # Referência nula = estado vazio (somas zero)
+    stmt = dialect_insert(bind, table)
+    current, new = table.__table__.c, stmt.excluded
+    delta = epoch_seconds(bind, new[ref]) - epoch_seconds(bind, current[ref])
+    empty = current[ref].is_(None) | new[ref].is_(None)
+    newer = new[ref].is_not(None) & (current[ref].is_(None) | (delta >= 0))
+    keep_current = case((empty, 1.0), (delta >= 0, func.exp(-delta / tau)), else_=1.0)
+    keep_new = case((empty, 1.0), (delta < 0, func.exp(delta / tau)), else_=1.0)
+    set_ = {name: current[name] * keep_current + new[name] * keep_new for name in sums}
+    set_[ref] = case((newer, new[ref]), else_=current[ref])
+    return stmt, set_, newer
+
+
+# ── Atualização incremental (a cada movimentação) ────────
+def _consumption_upsert(bind):
+    stmt, set_, _ = _decayed_upsert(bind, SupplyForecast, ("consumo_ponderado",), "ultima_saida", TAU_SECONDS)
+    forecast = SupplyForecast.__table__.c
+    set_["inicio"] = case((stmt.excluded.inicio < forecast.inicio, stmt.excluded.inicio), else_=forecast.inicio)
+    return stmt.on_conflict_do_update(index_elements=[forecast.supply_id], set_=set_)
+
+
+async def record_supply_consumption(db: AsyncSession, user_id: int, movements: Iterable) -> None:
+    # Soma as saídas recém-inseridas ao estado da previsão, na mesma transação
+    groups = {}
+    for m in movements:
+        if m.tipo != MovementType.saida:
+            continue
+        data = as_utc(m.data)
+        group = groups.setdefault(m.supply_id, {"consumo_ponderado": 0.0, "ref": data.timestamp(), "inicio": data})
+        group["consumo_ponderado"], group["ref"] = _merge_decayed(
+            group["consumo_ponderado"], group["ref"], m.quantidade, data.timestamp(), TAU_SECONDS
+        )
+        group["inicio"] = min(group["inicio"], data)
+    if groups:
+        await db.execute(_consumption_upsert(db.bind), [
+            {
+                "supply_id": supply_id,
+                "user_id": user_id,
+                "consumo_ponderado": group["consumo_ponderado"],
+                "ultima_saida": datetime.fromtimestamp(group["ref"], timezone.utc),
+                "inicio": group["inicio"],
+            }
+            for supply_id, group in groups.items()
+        ])
+
+
+# ── Recálculo em lote a partir do histórico ──────────────
+def rebuild_supply_forecasts(db: Session, user_id: Optional[int] = None) -> int:
+    # Lê as saídas em lotes e agrega cada lote com NumPy (sem laço por linha)
+    stmt = (
+        select(Movement.supply_id, Supply.user_id, Movement.quantidade, epoch_seconds(db.bind, Movement.data))
+        .join(Supply, Supply.id == Movement.supply_id)
+        .where(Movement.tipo == MovementType.saida)
+    )
+    if user_id is not None:
+        stmt = stmt.where(Supply.user_id == user_id)
+
+    totals: dict[int, list] = {}
+    for batch in db.execute(stmt.execution_options(yield_per=FORECAST_BATCH_SIZE)).partitions():
+        data = np.array(batch, dtype=float)
+        supply_ids, index = np.unique(data[:, 0].astype(np.int64), return_inverse=True)
+        # Cada insumo descontado até a sua última saída no lote
+        ultima = np.full(len(supply_ids), -np.inf)
+        np.maximum.at(ultima, index, data[:, 3])
+        weights = data[:, 2] * np.exp((data[:, 3] - ultima[index]) / TAU_SECONDS)
+        consumo = np.bincount(index, weights=weights, minlength=len(supply_ids))
+        inicio = np.full(len(supply_ids), np.inf)
+        np.minimum.at(inicio, index, data[:, 3])
+        owners = np.zeros(len(supply_ids), dtype=np.int64)
+        owners[index] = data[:, 1].astype(np.int64)
+
+        for supply_id, owner, s, ref, t0 in zip(
+            supply_ids.tolist(), owners.tolist(), consumo.tolist(), ultima.tolist(), inicio.tolist()
+        ):
+            current = totals.setdefault(supply_id, [owner, 0.0, ref, t0])
+            current[1], current[2] = _merge_decayed(current[1], current[2], s, ref, TAU_SECONDS)
+            current[3] = min(current[3], t0)
+
+    clear = delete(SupplyForecast)
+    if user_id is not None:
+        clear = clear.where(SupplyForecast.user_id == user_id)
+    db.execute(clear)
+    if totals:
+        db.execute(SupplyForecast.__table__.insert(), [
+            {
+                "supply_id": supply_id,
+                "user_id": owner,
+                "consumo_ponderado": s,
+                "ultima_saida": datetime.fromtimestamp(ref, timezone.utc),
+                "inicio": datetime.fromtimestamp(t0, timezone.utc),
+            }
+            for supply_id, (owner, s, ref, t0) in totals.items()
+        ])
+    return len(totals)
+
+
+# ── Projeção de ruptura de estoque ───────────────────────
+def project_consumption(
+    quantidade_atual: np.ndarray,
+    quantidade_minima: np.ndarray,
+    consumo_ponderado: np.ndarray,
+    inicio_ts: np.ndarray,
+    ultima_ts: np.ndarray,
+    now_ts: float,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # Taxa = soma ponderada das saídas / integral do peso na janela observada
+    # (consumo constante de c/dia resulta exatamente em c)
+    has_history = ~np.isnan(inicio_ts)
+    window = np.maximum(now_ts - np.where(has_history, inicio_ts, now_ts), MIN_WINDOW_SECONDS)
+    # Do desconto até a última saída para o desconto até agora (saída no futuro: peso 1)
+    elapsed = np.maximum(now_ts - np.where(has_history, ultima_ts, now_ts), 0)
+    decayed = np.nan_to_num(consumo_ponderado) * np.exp(-elapsed / TAU_SECONDS)
+    normalizer = (TAU_SECONDS / SECONDS_PER_DAY) * -np.expm1(-window / TAU_SECONDS)
+    consumo_diario = np.where(has_history, decayed / normalizer, 0.0)
+
+    consuming = consumo_diario > 0
+    rate = np.where(consuming, consumo_diario, 1.0)
+    dias_ate_ruptura = np.where(consuming, np.maximum(quantidade_atual, 0) / rate, np.nan)
+    dias_ate_minimo = np.where(consuming, np.maximum(quantidade_atual - quantidade_minima, 0) / rate, np.nan)
+    return consumo_diario, dias_ate_minimo, dias_ate_ruptura
+
+
+def _optional(value: float) -> Optional[float]:
+    return None if math.isnan(value) else round(value, 2)
+
+
+async def supply_forecasts(db: AsyncSession, user_id: int) -> list[dict]:
+    stmt = (
+        select(
+            *SUPPLY_OUT_COLUMNS,
+            SupplyForecast.consumo_ponderado,
+            epoch_seconds(db.bind, SupplyForecast.inicio).label("inicio_ts"),
+            epoch_seconds(db.bind, SupplyForecast.ultima_saida).label("ultima_ts"),
+        )
+        .outerjoin(SupplyForecast, SupplyForecast.supply_id == Supply.id)
+        .where(Supply.user_id == user_id)
+        .order_by(Supply.id)
+    )
+    rows = rows_as_dicts(await db.execute(stmt))
+    if not rows:
+        return []
+
+    def column(name):
+        return np.array([np.nan if r[name] is None else r[name] for r in rows], dtype=float)
+
+    now = datetime.now(timezone.utc)
+    consumo, dias_minimo, dias_ruptura = project_consumption(
+        np.nan_to_num(column("quantidade_atual")),
+        np.nan_to_num(column("quantidade_minima")),
+        column("consumo_ponderado"),
+        column("inicio_ts"),
+        column("ultima_ts"),
+        now.timestamp(),
+    )
+    for row, c, minimo, ruptura in zip(rows, consumo.tolist(), dias_minimo.tolist(), dias_ruptura.tolist()):
+        del row["consumo_ponderado"], row["inicio_ts"], row["ultima_ts"]
+        row["consumo_diario"] = round(c, 4)
+        row["dias_ate_minimo"] = _optional(minimo)
+        row["dias_ate_ruptura"] = _optional(ruptura)
+        row["data_ruptura"] = now + timedelta(days=ruptura) if ruptura <= MAX_HORIZON_DAYS else None
+    return rows
+
+
+# ── Ritmo de uso das máquinas ────────────────────────────
+# Regressão linear ponderada do horímetro no tempo (t em dias desde a época,
+# peso exp((t - ultima_leitura) / tau)): a inclinação é o ritmo em horas/dia.
+# Como na previsão de consumo, as somas ficam descontadas até a última leitura
+# e cada leitura nova (manutenção, atualização do horímetro) só desconta e soma
+# termos ao estado. O desconto comum não muda a inclinação.
+USAGE_TAU_DAYS = settings.MACHINE_USAGE_HALF_LIFE_DAYS / math.log(2)
+USAGE_SUMS = ("peso", "soma_t", "soma_h", "soma_tt", "soma_th")
+# Um horímetro não anda mais de 24 h por dia; leituras muito próximas não viram ritmo absurdo
+MAX_HOURS_PER_DAY = 24.0
+
+
+def _days(timestamps):
+    return (timestamps - EPOCH_TS) / SECONDS_PER_DAY
+
+
+def _usage_terms(t_days: np.ndarray, horimetro: np.ndarray, ref_days) -> np.ndarray:
+    w = np.exp((t_days - ref_days) / USAGE_TAU_DAYS)
+    return np.stack([w, w * t_days, w * horimetro, w * t_days * t_days, w * t_days * horimetro], axis=-1)
+
+
+def project_due_dates(
+    sums: np.ndarray,
+    ultima_leitura: np.ndarray,
+    ultimo_horimetro: np.ndarray,
+    proxima_manutencao: np.ndarray,
+) -> tuple[np.ndarray, np.ndarray]:
+    # sums: (n, 5) na ordem de USAGE_SUMS; datas em dias desde a época.
+    # Devolve o ritmo (h/dia) e a data prevista, ancorada na última leitura
+    peso, soma_t, soma_h, soma_tt, soma_th = sums.T
+    variance = peso * soma_tt - soma_t * soma_t
+    # Ao menos duas leituras em momentos distintos
+    valid = variance > 1e-9 * peso * soma_tt
+    slope = (peso * soma_th - soma_t * soma_h) / np.where(valid, variance, 1.0)
+    rate = np.where(valid & (slope > 0), np.minimum(slope, MAX_HOURS_PER_DAY), np.nan)
+
+    due = ultima_leitura + (proxima_manutencao - ultimo_horimetro) / rate
+    due = np.where(np.abs(due - ultima_leitura) <= MAX_HORIZON_DAYS, due, np.nan)
+    return rate, due
+
+
+def _from_days(value: float) -> Optional[datetime]:
+    return None if math.isnan(value) else FORECAST_EPOCH + timedelta(days=value)
+
+
+def _usage_upsert(bind):
+    stmt, set_, newer = _decayed_upsert(
+        bind, MachineForecast, USAGE_SUMS, "ultima_leitura", USAGE_TAU_DAYS * SECONDS_PER_DAY
+    )
+    forecast = MachineForecast.__table__.c
+    set_["ultimo_horimetro"] = case((newer, stmt.excluded.ultimo_horimetro), else_=forecast.ultimo_horimetro)
+    return stmt.on_conflict_do_update(index_elements=[forecast.machine_id], set_=set_).returning(
+        forecast.machine_id,
+        *(forecast[name] for name in USAGE_SUMS),
+        forecast.ultima_leitura,
+        forecast.ultimo_horimetro,
+    )
+
+
+async def record_machine_usage(db: AsyncSession, user_id: int, machines: Iterable, readings: Iterable = ()) -> None:
+    # readings: (machine_id, data, horimetro). Máquinas sem leitura nova só têm a
+    # data prevista recalculada (ex.: mudou o intervalo de manutenção)
+    machines = {machine.id: machine for machine in machines}
+    rows = {
+        machine_id: {
+            "machine_id": machine_id,
+            "user_id": user_id,
+            **{name: 0.0 for name in USAGE_SUMS},
+            "ultima_leitura": None,
+            "ultimo_horimetro": None,
+        }
+        for machine_id in machines
+    }
+    by_machine = {}
+    for machine_id, data, horimetro in readings:
+        by_machine.setdefault(machine_id, []).append((as_utc(data), horimetro))
+    for machine_id, machine_readings in by_machine.items():
+        row = rows[machine_id]
+        # Somas descontadas até a leitura mais recente do lote
+        row["ultima_leitura"], row["ultimo_horimetro"] = max(machine_readings, key=lambda r: r[0])
+        t_days = np.array([_days(data.timestamp()) for data, _ in machine_readings])
+        terms = _usage_terms(
+            t_days, np.array([h for _, h in machine_readings], dtype=float), t_days.max()
+        ).sum(axis=0)
+        row.update(zip(USAGE_SUMS, terms.tolist()))
+    if not rows:
+        return
+
+    state = (await db.execute(_usage_upsert(db.bind), list(rows.values()))).all()
+    rate, due = project_due_dates(
+        np.array([[getattr(r, name) for name in USAGE_SUMS] for r in state], dtype=float),
+        np.array([np.nan if r.ultima_leitura is None else _days(as_utc(r.ultima_leitura).timestamp()) for r in state]),
+        np.array([np.nan if r.ultimo_horimetro is None else r.ultimo_horimetro for r in state], dtype=float),
+        np.array([machines[r.machine_id].proxima_manutencao for r in state], dtype=float),
+    )
+    await db.execute(update(MachineForecast), [
+        {"machine_id": r.machine_id, "horas_por_dia": _optional(h), "data_prevista": _from_days(d)}
+        for r, h, d in zip(state, rate.tolist(), due.tolist())
+    ])
+
+
+def rebuild_machine_forecasts(db: Session, user_id: Optional[int] = None) -> int:
+    # Regressão de toda a frota: somas por máquina com NumPy, lote a lote
+    stmt = (
+        select(Maintenance.machine_id, epoch_seconds(db.bind, Maintenance.data), Maintenance.horimetro_no_momento)
+        .join(Machine, Machine.id == Maintenance.machine_id)
+    )
+    machines_stmt = select(Machine.id, Machine.user_id, Machine.proxima_manutencao)
+    if user_id is not None:
+        stmt = stmt.where(Machine.user_id == user_id)
+        machines_stmt = machines_stmt.where(Machine.user_id == user_id)
+
+    history: dict[int, list] = {}
+    for batch in db.execute(stmt.execution_options(yield_per=FORECAST_BATCH_SIZE)).partitions():
+        data = np.array(batch, dtype=float)
+        t_days = _days(data[:, 1])
+        order = np.lexsort((t_days, data[:, 0]))
+        ids, t_days, horimetro = data[order, 0].astype(np.int64), t_days[order], data[order, 2]
+        machine_ids, index = np.unique(ids, return_inverse=True)
+        last = np.r_[ids[1:] != ids[:-1], True]  # última leitura de cada máquina (ordenado por id, t)
+        # Cada máquina descontada até a sua última leitura no lote
+        terms = _usage_terms(t_days, horimetro, t_days[last][index])
+        sums = np.stack([np.bincount(index, weights=terms[:, k], minlength=len(machine_ids)) for k in range(5)], axis=1)
+
+        for machine_id, s, t_last, h_last in zip(
+            machine_ids.tolist(), sums, t_days[last].tolist(), horimetro[last].tolist()
+        ):
+            current = history.get(machine_id)
+            if current is None:
+                history[machine_id] = [s, t_last, h_last]
+                continue
+            newer = t_last >= current[1]
+            current[0], _ = _merge_decayed(current[0], current[1], s, t_last, USAGE_TAU_DAYS)
+            if newer:
+                current[1], current[2] = t_last, h_last
+
+    fleet = db.execute(machines_stmt).all()
+    clear = delete(MachineForecast)
+    if user_id is not None:
+        clear = clear.where(MachineForecast.user_id == user_id)
+    db.execute(clear)
+    if not fleet:
+        return 0
+
+    empty = [np.zeros(5), np.nan, np.nan]
+    states = [history.get(machine_id, empty) for machine_id, _, _ in fleet]
+    sums = np.array([s for s, _, _ in states])
+    ultima = np.array([t for _, t, _ in states], dtype=float)
+    ultimo_h = np.array([h for _, _, h in states], dtype=float)
+    rate, due = project_due_dates(sums, ultima, ultimo_h, np.array([p for _, _, p in fleet], dtype=float))
+
+    db.execute(MachineForecast.__table__.insert(), [
+        {
+            "machine_id": machine_id,
+            "user_id": owner,
+            **dict(zip(USAGE_SUMS, s.tolist())),
+            "ultima_leitura": _from_days(t),
+            "ultimo_horimetro": None if math.isnan(h) else h,
+            "horas_por_dia": _optional(r),
+            "data_prevista": _from_days(d),
+        }
+        for (machine_id, owner, _), s, t, h, r, d in zip(
+            fleet, sums, ultima.tolist(), ultimo_h.tolist(), rate.tolist(), due.tolist()
+        )
+    ])
+    return len(fleet)
@@ -0,0 +1,207 @@
+import logging
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+
+logger = logging.getLogger("app.instrumentation")
+
+# Limites (ms) do histograma de latência por rota
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+# ── Estatísticas da requisição corrente ──────────────────
+class RequestStats:
+    __slots__ = ("queries", "db_ms", "statements")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_ms = 0.0
+        self.statements = Counter()
+
+
+_current: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+def current_stats() -> Optional[RequestStats]:
+    return _current.get()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    if stats is None:
+        return
+    started = conn.info.get("query_started")
+    if started:
+        stats.db_ms += (time.perf_counter() - started.pop()) * 1000
+    stats.queries += 1
+    stats.statements[statement] += 1
+
+
+def instrument_queries(engine) -> None:
+    # Conta statements e tempo de banco da requisição em andamento (se houver)
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+# ── Agregados por rota ───────────────────────────────────
+class RouteMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes: dict[tuple[str, str, int], dict] = {}
+
+    def observe(self, method: str, route: str, status: int, elapsed_ms: float, stats: RequestStats) -> None:
+        key = (method, route, status)
+        with self._lock:
+            entry = self._routes.get(key)
+            if entry is None:
+                entry = self._routes[key] = {
+                    "count": 0,
+                    "latency_ms": 0.0,
+                    "queries": 0,
+                    "db_ms": 0.0,
+                    "buckets": [0] * (len(LATENCY_BUCKETS_MS) + 1),
+                }
+            entry["count"] += 1
+            entry["latency_ms"] += elapsed_ms
+            entry["queries"] += stats.queries
+            entry["db_ms"] += stats.db_ms
+            for i, limit in enumerate(LATENCY_BUCKETS_MS):
+                if elapsed_ms <= limit:
+                    entry["buckets"][i] += 1
+                    break
+            else:
+                entry["buckets"][-1] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {key: {**entry, "buckets": list(entry["buckets"])} for key, entry in self._routes.items()}
+
+
+route_metrics = RouteMetrics()
+
+
+# ── Middleware ASGI ──────────────────────────────────────
+class InstrumentationMiddleware:
+    def __init__(self, app, query_warn_threshold: int = 20, server_timing: bool = True):
+        self.app = app
+        self.query_warn_threshold = query_warn_threshold
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if self.server_timing:
+                    elapsed_ms = (time.perf_counter() - started) * 1000
+                    timing = (
+                        f'db;dur={stats.db_ms:.1f};desc="{stats.queries} queries", '
+                        f"app;dur={elapsed_ms:.1f}"
+                    )
+                    message["headers"] = [*message.get("headers", []), (b"server-timing", timing.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            route = scope.get("route")
+            path = getattr(route, "path", "<sem rota>")
+            route_metrics.observe(scope["method"], path, status, elapsed_ms, stats)
+            if self.query_warn_threshold and stats.queries > self.query_warn_threshold:
+                statement, repeats = stats.statements.most_common(1)[0]
+                logger.warning(
+                    "%s %s executou %d queries (%.1f ms no banco); possível N+1. "
+                    "Mais repetida (%dx): %s",
+                    scope["method"], path, stats.queries, stats.db_ms, repeats, " ".join(statement.split())[:200],
+                )
+
+
+# ── Exposição no formato Prometheus ──────────────────────
+def _labels(**labels) -> str:
+    def escape(value) -> str:
+        return str(value).replace("\\", "\\\\").replace('"', '\\"')
+
+    return "{" + ",".join(f'{k}="{escape(v)}"' for k, v in labels.items()) + "}"
+
+
+def render_prometheus(pools: dict) -> str:
+    lines = [
+        "# HELP http_requests_total Requisições HTTP atendidas.",
+        "# TYPE http_requests_total counter",
+    ]
+    routes = route_metrics.snapshot()
+    for (method, route, status), entry in routes.items():
+        lines.append(f"http_requests_total{_labels(method=method, route=route, status=status)} {entry['count']}")
+
+    lines += [
+        "# HELP http_request_duration_ms Latência das requisições HTTP.",
+        "# TYPE http_request_duration_ms histogram",
+    ]
+    for (method, route, status), entry in routes.items():
+        cumulative = 0
+        for limit, count in zip((*LATENCY_BUCKETS_MS, "+Inf"), entry["buckets"]):
+            cumulative += count
+            lines.append(
+                f"http_request_duration_ms_bucket{_labels(method=method, route=route, status=status, le=limit)} {cumulative}"
+            )
+        labels = _labels(method=method, route=route, status=status)
+        lines.append(f"http_request_duration_ms_sum{labels} {entry['latency_ms']:.3f}")
+        lines.append(f"http_request_duration_ms_count{labels} {entry['count']}")
+
+    lines += [
+        "# HELP http_request_db_queries_total Statements SQL executados pelas requisições.",
+        "# TYPE http_request_db_queries_total counter",
+    ]
+    for (method, route, status), entry in routes.items():
+        lines.append(f"http_request_db_queries_total{_labels(method=method, route=route, status=status)} {entry['queries']}")
+
+    lines += [
+        "# HELP http_request_db_duration_ms_total Tempo gasto no banco pelas requisições.",
+        "# TYPE http_request_db_duration_ms_total counter",
+    ]
+    for (method, route, status), entry in routes.items():
+        lines.append(
+            f"http_request_db_duration_ms_total{_labels(method=method, route=route, status=status)} {entry['db_ms']:.3f}"
+        )
+
+    # Pool de conexões (mesmos números de /api/health/pool)
+    gauges = ("in_use", "max_in_use")
+    counters = ("connects", "checkouts", "checkins", "invalidations", "timeouts", "wait_count")
+    for name in gauges:
+        lines.append(f"# TYPE db_pool_{name} gauge")
+        for pool, snapshot in pools.items():
+            lines.append(f"db_pool_{name}{_labels(pool=pool)} {snapshot[name]}")
+    for name in counters:
+        lines.append(f"# TYPE db_pool_{name}_total counter")
+        for pool, snapshot in pools.items():
+            lines.append(f"db_pool_{name}_total{_labels(pool=pool)} {snapshot[name]}")
+    lines.append("# TYPE db_pool_wait_ms histogram")
+    for pool, snapshot in pools.items():
+        cumulative = 0
+        for limit, count in snapshot["wait_buckets_ms"].items():
+            cumulative += count
+            lines.append(f"db_pool_wait_ms_bucket{_labels(pool=pool, le=limit)} {cumulative}")
+        lines.append(f"db_pool_wait_ms_sum{_labels(pool=pool)} {snapshot['wait_avg_ms'] * snapshot['wait_count']:.3f}")
+        lines.append(f"db_pool_wait_ms_count{_labels(pool=pool)} {snapshot['wait_count']}")
+
+    return "\n".join(lines) + "\n"
@@ -1,15 +1,55 @@
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
+
+from fastapi import Depends, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
+
+from app.auth import password_hasher
+from app.config import settings
+from app.database import async_engine, async_pool_metrics, pool_stats, sync_pool_metrics
+from app.instrumentation import InstrumentationMiddleware, render_prometheus
+from app.outbox import run_worker
+from app.pagination import NEXT_CURSOR_HEADER
+from app.partitions import run_maintenance
+from app.ratelimit import AdmissionMiddleware, rate_limit
+from app.routes import analytics, auth, dashboard, exports, machines, maintenance, supplies, movements, search, sync, telemetry
+from app.telemetry import run_flusher
+
+# O esquema é das migrações (alembic upgrade head): a inicialização não faz DDL
 
-from app.database import engine, Base
-from app.routes import auth, machines, maintenance, supplies, movements
 
-Base.metadata.create_all(bind=engine)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    stop = asyncio.Event()
+    tasks = []
+    if settings.OUTBOX_EMBEDDED_WORKER:
+        tasks.append(asyncio.create_task(run_worker(stop)))
+    if settings.PARTITION_MAINTENANCE_EMBEDDED:
+        tasks.append(asyncio.create_task(run_maintenance(stop)))
+    # Leituras de telemetria só existem na memória deste processo: o flush é sempre embutido
+    tasks.append(asyncio.create_task(run_flusher(stop)))
+    yield
+    stop.set()
+    await asyncio.gather(*tasks)
+    password_hasher.shutdown()
+    await async_engine.dispose()
+
 
 app = FastAPI(
     title="Terra em Dia",
     description="Sistema de controle de manutenção de máquinas agrícolas e estoque de insumos",
     version="1.0.0",
+    lifespan=lifespan,
+)
+
+# Dentro do CORS: o 503 de sobrecarga também sai com os cabeçalhos que o navegador exige
+app.add_middleware(
+    AdmissionMiddleware,
+    max_concurrent=settings.admission_max_concurrent,
+    queue_size=settings.ADMISSION_QUEUE_SIZE,
+    queue_timeout=settings.ADMISSION_QUEUE_TIMEOUT_SECONDS,
+    exempt_paths=("/", "/api/", "/api/health/pool", "/metrics"),
 )
 
 app.add_middleware(
@@ -18,13 +58,26 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, "ETag", "Server-Timing", "Retry-After"],
 )
 
+if settings.METRICS_ENABLED:
+    app.add_middleware(InstrumentationMiddleware, query_warn_threshold=settings.METRICS_QUERY_WARN_THRESHOLD)
+
+# Login e cadastro têm o próprio limite (routes/auth.py); as demais rotas, um balde
+# por usuário e rota
+limited = [Depends(rate_limit)]
 app.include_router(auth.router, prefix="/api", tags=["Auth"])
-app.include_router(machines.router, prefix="/api/machines", tags=["Machines"])
-app.include_router(maintenance.router, prefix="/api/maintenance", tags=["Maintenance"])
-app.include_router(supplies.router, prefix="/api/supplies", tags=["Supplies"])
-app.include_router(movements.router, prefix="/api/movements", tags=["Movements"])
+app.include_router(machines.router, prefix="/api/machines", tags=["Machines"], dependencies=limited)
+app.include_router(maintenance.router, prefix="/api/maintenance", tags=["Maintenance"], dependencies=limited)
+app.include_router(supplies.router, prefix="/api/supplies", tags=["Supplies"], dependencies=limited)
+app.include_router(movements.router, prefix="/api/movements", tags=["Movements"], dependencies=limited)
+app.include_router(dashboard.router, prefix="/api/dashboard", tags=["Dashboard"], dependencies=limited)
+app.include_router(analytics.router, prefix="/api/analytics", tags=["Analytics"], dependencies=limited)
+app.include_router(exports.router, prefix="/api/export", tags=["Export"], dependencies=limited)
+app.include_router(sync.router, prefix="/api/sync", tags=["Sync"], dependencies=limited)
+app.include_router(search.router, prefix="/api/search", tags=["Search"], dependencies=limited)
+app.include_router(telemetry.router, prefix="/api/telemetry", tags=["Telemetry"], dependencies=limited)
 
 @app.get("/")
 def healthcheck():
@@ -33,3 +86,12 @@ def healthcheck():
 @app.get("/api/")
 def api_healthcheck():
     return {"status": "ok"}
+
+@app.get("/api/health/pool")
+def pool_healthcheck():
+    return pool_stats()
+
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+def metrics():
+    pools = {"sync": sync_pool_metrics.snapshot(), "async": async_pool_metrics.snapshot()}
+    return PlainTextResponse(render_prometheus(pools), media_type="text/plain; version=0.0.4")
@@ -1,11 +1,48 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Enum as SAEnum
-from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, ForeignKey, Index, JSON, case, event, literal_column, Enum as SAEnum
+from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.orm import Session, relationship, with_loader_criteria
+from sqlalchemy.sql.elements import Grouping
+from sqlalchemy.sql import func, text
 import enum
 
 from app.database import Base
 
 
+MACHINE_STATUSES = ("OK", "Próximo", "Atenção")
+SUPPLY_STATUSES = ("OK", "Estoque Baixo")
+
+
+def _sql_constant(sql: str, type_):
+    # Constante escrita no SQL, não parâmetro: o asyncpg mandaria $n::VARCHAR e o
+    # Postgres não reconheceria a expressão dos índices de status (migração 0003)
+    return literal_column(sql, type_)
+
+
+# ── Sincronização e exclusão lógica ──────────────────────
+# Linhas que os tablets sincronizam offline. change_id vem do contador do usuário
+# (users.change_seq, ver app/versioning.py) e cresce na ordem dos commits; excluir
+# só preenche deleted_at, e a linha fica como lápide para o /api/sync
+class SyncMixin:
+    updated_at = Column(DateTime(timezone=True), default=func.now(), server_default=func.now(), onupdate=func.now())
+    deleted_at = Column(DateTime(timezone=True))
+    change_id = Column(Integer, nullable=False, default=0, server_default="0")
+
+
+# Toda consulta ORM (SELECT, UPDATE, DELETE) ignora linhas excluídas, inclusive em
+# JOINs e relacionamentos. Só quem precisa das lápides pede include_deleted=True
+@event.listens_for(Session, "do_orm_execute")
+def _hide_deleted(state):
+    if (
+        (state.is_select or state.is_update or state.is_delete)
+        and not state.is_column_load
+        and not state.is_relationship_load
+        and not state.execution_options.get("include_deleted", False)
+    ):
+        state.statement = state.statement.options(
+            with_loader_criteria(SyncMixin, lambda cls: cls.deleted_at.is_(None), include_aliases=True)
+        )
+
+
 # ── Usuário ──────────────────────────────────────────────
 class User(Base):
     __tablename__ = "users"
@@ -14,6 +51,10 @@ class User(Base):
     email = Column(String, unique=True, index=True, nullable=False)
     hashed_password = Column(String, nullable=False)
     name = Column(String, nullable=False)
+    # Incrementar invalida todos os tokens já emitidos para o usuário
+    token_version = Column(Integer, nullable=False, default=0, server_default="0")
+    # Último change_id emitido para as linhas do usuário
+    change_seq = Column(Integer, nullable=False, default=0, server_default="0")
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     machines = relationship("Machine", back_populates="owner", cascade="all, delete-orphan")
@@ -21,7 +62,16 @@ class User(Base):
 
 
 # ── Máquinas ─────────────────────────────────────────────
-class Machine(Base):
+def machine_status(horimetro_atual: float, proxima_manutencao: float, intervalo_manutencao: float) -> str:
+    if horimetro_atual >= proxima_manutencao:
+        return "Atenção"
+    diff = proxima_manutencao - horimetro_atual
+    if diff <= intervalo_manutencao * 0.1:
+        return "Próximo"
+    return "OK"
+
+
+class Machine(SyncMixin, Base):
     __tablename__ = "machines"
 
     id = Column(Integer, primary_key=True, index=True)
@@ -35,33 +85,115 @@ class Machine(Base):
 
     owner = relationship("User", back_populates="machines")
     maintenances = relationship("Maintenance", back_populates="machine", cascade="all, delete-orphan")
+    cost_rollups = relationship("MaintenanceCostRollup", cascade="all, delete-orphan")
+    forecast = relationship("MachineForecast", cascade="all, delete-orphan", uselist=False)
 
-    @property
+    @hybrid_property
     def status(self) -> str:
-        if self.horimetro_atual >= self.proxima_manutencao:
-            return "Atenção"
-        diff = self.proxima_manutencao - self.horimetro_atual
-        if diff <= self.intervalo_manutencao * 0.1:
-            return "Próximo"
-        return "OK"
+        return machine_status(self.horimetro_atual, self.proxima_manutencao, self.intervalo_manutencao)
 
+    # Mesma regra em SQL, usada em filtros e no índice ix_machines_user_id_status
+    @status.inplace.expression
+    @classmethod
+    def _status_expression(cls):
+        return case(
+            (cls.horimetro_atual >= cls.proxima_manutencao, _sql_constant("'Atenção'", String)),
+            (
+                cls.proxima_manutencao - cls.horimetro_atual <= cls.intervalo_manutencao * _sql_constant("0.1", Float),
+                _sql_constant("'Próximo'", String),
+            ),
+            else_=_sql_constant("'OK'", String),
+        )
 
-class Maintenance(Base):
+
+class Maintenance(SyncMixin, Base):
     __tablename__ = "maintenances"
+    __table_args__ = (
+        # Histórico por máquina paginado por (data, id)
+        Index("ix_maintenances_machine_id_data", "machine_id", "data", "id"),
+        Index("ix_maintenances_machine_id_change_id", "machine_id", "change_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     machine_id = Column(Integer, ForeignKey("machines.id"), nullable=False)
     descricao = Column(String, nullable=False)
     horimetro_no_momento = Column(Float, nullable=False)
-    data = Column(DateTime(timezone=True), server_default=func.now())
+    data = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
     custo = Column(Float, default=0)
     observacao = Column(String, default="")
 
     machine = relationship("Machine", back_populates="maintenances")
 
+    # Traz `data` (server default) já no INSERT ... RETURNING
+    __mapper_args__ = {"eager_defaults": True}
+
+
+# Agregado incremental de custos por máquina e mês, mantido a cada manutenção
+class MaintenanceCostRollup(Base):
+    __tablename__ = "maintenance_cost_rollups"
+
+    machine_id = Column(Integer, ForeignKey("machines.id"), primary_key=True)
+    mes = Column(Date, primary_key=True)  # primeiro dia do mês
+    quantidade = Column(Integer, nullable=False, default=0)
+    custo_total = Column(Float, nullable=False, default=0)
+    ultimo_horimetro = Column(Float, nullable=False, default=0)
+    ultima_data = Column(DateTime(timezone=True), nullable=False)
+
+
+# Ritmo de uso (horas/dia) e data prevista da próxima manutenção (ver app/forecasting.py).
+# Guarda as somas da regressão ponderada horímetro x tempo, descontadas até
+# ultima_leitura: cada leitura nova só desconta e soma termos. data_prevista fica materializada para a consulta "vence em N dias"
+class MachineForecast(Base):
+    __tablename__ = "machine_forecasts"
+    __table_args__ = (
+        Index("ix_machine_forecasts_user_id_data_prevista", "user_id", "data_prevista"),
+    )
+
+    machine_id = Column(Integer, ForeignKey("machines.id"), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    # Somas com peso exp((t - ultima_leitura) / tau), t em dias desde FORECAST_EPOCH e h = horímetro
+    peso = Column(Float, nullable=False, default=0)
+    soma_t = Column(Float, nullable=False, default=0)
+    soma_h = Column(Float, nullable=False, default=0)
+    soma_tt = Column(Float, nullable=False, default=0)
+    soma_th = Column(Float, nullable=False, default=0)
+    ultima_leitura = Column(DateTime(timezone=True))
+    ultimo_horimetro = Column(Float)
+    horas_por_dia = Column(Float)
+    data_prevista = Column(DateTime(timezone=True))
+
+
+# Índice de expressão: filtrar por status não exige carregar a frota inteira.
+# O Postgres exige a expressão entre parênteses na definição do índice.
+Index("ix_machines_user_id_status", Machine.user_id, Grouping(Machine.status))
+# Alterações desde um change_id (GET /api/sync)
+Index("ix_machines_user_id_change_id", Machine.user_id, Machine.change_id)
+
+# Colunas dos schemas de saída para o caminho rápido de leitura (sem objetos ORM);
+# o status é calculado no próprio SELECT
+MACHINE_OUT_COLUMNS = (
+    Machine.id,
+    Machine.nome,
+    Machine.tipo,
+    Machine.horimetro_atual,
+    Machine.intervalo_manutencao,
+    Machine.proxima_manutencao,
+    Machine.status.label("status"),
+    Machine.created_at,
+)
+MAINTENANCE_OUT_COLUMNS = (
+    Maintenance.id,
+    Maintenance.machine_id,
+    Maintenance.descricao,
+    Maintenance.horimetro_no_momento,
+    Maintenance.data,
+    Maintenance.custo,
+    Maintenance.observacao,
+)
+
 
 # ── Estoque ──────────────────────────────────────────────
-class Supply(Base):
+class Supply(SyncMixin, Base):
     __tablename__ = "supplies"
 
     id = Column(Integer, primary_key=True, index=True)
@@ -74,27 +206,124 @@ class Supply(Base):
 
     owner = relationship("User", back_populates="supplies")
     movements = relationship("Movement", back_populates="supply", cascade="all, delete-orphan")
+    forecast = relationship("SupplyForecast", cascade="all, delete-orphan", uselist=False)
 
-    @property
+    @hybrid_property
     def status(self) -> str:
         if self.quantidade_atual <= self.quantidade_minima:
             return "Estoque Baixo"
         return "OK"
 
+    @status.inplace.expression
+    @classmethod
+    def _status_expression(cls):
+        return case(
+            (cls.quantidade_atual <= cls.quantidade_minima, _sql_constant("'Estoque Baixo'", String)),
+            else_=_sql_constant("'OK'", String),
+        )
+
+
+Index("ix_supplies_user_id_status", Supply.user_id, Grouping(Supply.status))
+Index("ix_supplies_user_id_change_id", Supply.user_id, Supply.change_id)
+
+SUPPLY_OUT_COLUMNS = (
+    Supply.id,
+    Supply.nome,
+    Supply.unidade,
+    Supply.quantidade_atual,
+    Supply.quantidade_minima,
+    Supply.status.label("status"),
+    Supply.created_at,
+)
+
 
 class MovementType(str, enum.Enum):
     entrada = "entrada"
     saida = "saida"
 
 
-class Movement(Base):
+class Movement(SyncMixin, Base):
     __tablename__ = "movements"
+    __table_args__ = (
+        # Histórico por insumo paginado por (data, id)
+        Index("ix_movements_supply_id_data", "supply_id", "data", "id"),
+        Index("ix_movements_supply_id_change_id", "supply_id", "change_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     supply_id = Column(Integer, ForeignKey("supplies.id"), nullable=False)
     tipo = Column(SAEnum(MovementType), nullable=False)
     quantidade = Column(Float, nullable=False)
-    data = Column(DateTime(timezone=True), server_default=func.now())
+    data = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
     observacao = Column(String, default="")
 
     supply = relationship("Supply", back_populates="movements")
+
+    # Traz `data` (server default) já no INSERT ... RETURNING
+    __mapper_args__ = {"eager_defaults": True}
+
+
+# Estado da previsão de consumo de cada insumo (ver app/forecasting.py).
+# consumo_ponderado = soma das saídas com peso exp((data - ultima_saida) / tau):
+# cada nova saída só desconta o estado e soma um termo, sem reler o histórico
+class SupplyForecast(Base):
+    __tablename__ = "supply_forecasts"
+
+    supply_id = Column(Integer, ForeignKey("supplies.id"), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    consumo_ponderado = Column(Float, nullable=False, default=0)
+    ultima_saida = Column(DateTime(timezone=True), nullable=False)  # referência do desconto
+    inicio = Column(DateTime(timezone=True), nullable=False)  # primeira saída observada
+
+
+MOVEMENT_OUT_COLUMNS = (
+    Movement.id,
+    Movement.supply_id,
+    Movement.tipo,
+    Movement.quantidade,
+    Movement.data,
+    Movement.observacao,
+)
+
+
+# ── Versões de coleção (ETag) ────────────────────────────
+# Incrementada na mesma transação de cada escrita; o ETag das listagens
+# deriva daqui, sem consultar as tabelas de dados
+class CollectionVersion(Base):
+    __tablename__ = "collection_versions"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    collection = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+
+# ── Outbox de eventos ────────────────────────────────────
+# Gravado na mesma transação da escrita; o worker (app/outbox.py) drena em lotes
+class OutboxEvent(Base):
+    __tablename__ = "outbox_events"
+    __table_args__ = (
+        # Só os pendentes entram no índice que o worker percorre
+        Index(
+            "ix_outbox_events_pendentes",
+            "id",
+            postgresql_where=text("processado_em IS NULL"),
+            sqlite_where=text("processado_em IS NULL"),
+        ),
+    )
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, nullable=False)
+    tipo = Column(String, nullable=False)
+    payload = Column(JSON, nullable=False)
+    criado_em = Column(DateTime(timezone=True), server_default=func.now())
+    processado_em = Column(DateTime(timezone=True), index=True)
+    tentativas = Column(Integer, nullable=False, default=0, server_default="0")
+    erro = Column(String)
+
+
+# Marcador de entrega: (evento, handler) já aplicado; torna a reentrega idempotente
+class OutboxDelivery(Base):
+    __tablename__ = "outbox_deliveries"
+
+    event_id = Column(Integer, ForeignKey("outbox_events.id"), primary_key=True)
+    handler = Column(String, primary_key=True)
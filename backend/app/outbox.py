@@ -0,0 +1,217 @@
+import argparse
+import asyncio
+import logging
+import signal
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Optional
+
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.forecasting import record_machine_usage, record_supply_consumption
+from app.models import Machine, Maintenance, Movement, OutboxDelivery, OutboxEvent
+from app.rollups import record_maintenance_costs
+
+logger = logging.getLogger("app.outbox")
+
+MAINTENANCE_CREATED = "maintenance.created"
+MOVEMENT_CREATED = "movement.created"
+# Leituras de horímetro aplicadas pela telemetria (app/telemetry.py)
+MACHINE_READINGS = "machine.readings"
+# Máquina entrou em "Próximo" ou "Atenção"; ver alert_status_changes
+MACHINE_STATUS_CHANGED = "machine.status_changed"
+# Com a fila ociosa, limpa eventos processados a cada tantos ciclos de espera
+PURGE_EVERY_IDLE_CYCLES = 600
+
+Handler = Callable[[AsyncSession, OutboxEvent], Awaitable[None]]
+HANDLERS: dict[str, list[tuple[str, Handler]]] = {}
+
+
+# ── Publicação (na transação da escrita) ─────────────────
+def enqueue(db: AsyncSession, user_id: int, tipo: str, payload: dict) -> None:
+    # Vai para o banco no mesmo commit da escrita: sem evento perdido nem evento órfão
+    db.add(OutboxEvent(user_id=user_id, tipo=tipo, payload=payload))
+
+
+def handler(tipo: str):
+    def register(fn: Handler) -> Handler:
+        HANDLERS.setdefault(tipo, []).append((f"{fn.__module__}.{fn.__qualname__}", fn))
+        return fn
+
+    return register
+
+
+# ── Consumo ──────────────────────────────────────────────
+async def _deliver(db: AsyncSession, event: OutboxEvent) -> bool:
+    # Entrega pelo menos uma vez; o marcador (evento, handler) gravado junto com o
+    # efeito do handler torna a reentrega inócua
+    done = set(await db.scalars(select(OutboxDelivery.handler).where(OutboxDelivery.event_id == event.id)))
+    for name, fn in HANDLERS.get(event.tipo, []):
+        if name in done:
+            continue
+        try:
+            async with db.begin_nested():
+                await fn(db, event)
+                db.add(OutboxDelivery(event_id=event.id, handler=name))
+        except Exception as exc:
+            logger.exception("evento %s (%s): handler %s falhou", event.id, event.tipo, name)
+            event.tentativas += 1
+            event.erro = f"{name}: {exc}"[:500]
+            return False
+    event.processado_em = datetime.now(timezone.utc)
+    event.erro = None
+    return True
+
+
+async def drain_once(batch_size: Optional[int] = None) -> int:
+    # Um lote de eventos pendentes numa transação. No Postgres, SKIP LOCKED deixa
+    # vários workers drenarem em paralelo sem pegar o mesmo evento
+    batch_size = batch_size or settings.OUTBOX_BATCH_SIZE
+    async with AsyncSessionLocal() as db:
+        events = (await db.scalars(
+            select(OutboxEvent)
+            .where(OutboxEvent.processado_em.is_(None), OutboxEvent.tentativas < settings.OUTBOX_MAX_ATTEMPTS)
+            .order_by(OutboxEvent.id)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+        )).all()
+        delivered = 0
+        for event in events:
+            delivered += await _deliver(db, event)
+        await db.commit()
+        return delivered
+
+
+async def purge_processed(older_than: timedelta) -> None:
+    limit = datetime.now(timezone.utc) - older_than
+    async with AsyncSessionLocal() as db:
+        processed = select(OutboxEvent.id).where(OutboxEvent.processado_em < limit).scalar_subquery()
+        await db.execute(delete(OutboxDelivery).where(OutboxDelivery.event_id.in_(processed)))
+        await db.execute(delete(OutboxEvent).where(OutboxEvent.processado_em < limit))
+        await db.commit()
+
+
+async def run_worker(stop: asyncio.Event) -> None:
+    logger.info("worker do outbox iniciado")
+    idle_cycles = 0
+    while not stop.is_set():
+        try:
+            delivered = await drain_once()
+        except Exception:
+            logger.exception("falha ao drenar o outbox")
+            delivered = 0
+        if delivered > 0:
+            idle_cycles = 0
+            continue
+        # Fila vazia (ou só eventos falhando): espera antes de consultar de novo
+        idle_cycles += 1
+        if idle_cycles % PURGE_EVERY_IDLE_CYCLES == 1:
+            await purge_processed(timedelta(hours=settings.OUTBOX_RETENTION_HOURS))
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=settings.OUTBOX_POLL_INTERVAL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+    logger.info("worker do outbox encerrado")
+
+
+# ── Handlers ─────────────────────────────────────────────
+async def _maintenances(db: AsyncSession, event: OutboxEvent):
+    # Manutenções do evento com as máquinas, lidas uma vez por evento e
+    # compartilhadas pelos handlers de MAINTENANCE_CREATED (cache na sessão do lote).
+    # FOR KEY SHARE (read=True) nas máquinas: a exclusão da máquina é lógica (UPDATE
+    # de deleted_at, que trava FOR NO KEY UPDATE) e não conflita com ele, nem os
+    # UPDATEs do horímetro nas rotas e na telemetria; a trava só impede que a chave
+    # referenciada pelos agregados e previsões suma até o commit. Máquina já
+    # excluída sai do JOIN e o evento vira no-op; uma exclusão confirmada depois
+    # desta leitura deixa derivados que o JOIN das consultas esconde, como os das
+    # demais máquinas excluídas. Em ordem de máquina, para os upserts dos derivados
+    # travarem as linhas na mesma ordem em workers concorrentes
+    cache = db.info.setdefault("outbox_maintenances", {})
+    if event.id not in cache:
+        cache[event.id] = (await db.execute(
+            select(Maintenance.id, Maintenance.data, Maintenance.horimetro_no_momento, Machine)
+            .join(Machine, Machine.id == Maintenance.machine_id)
+            .where(Maintenance.id.in_(event.payload["ids"]))
+            .order_by(Maintenance.machine_id)
+            .with_for_update(of=Machine, key_share=True, read=True)
+        )).all()
+    return cache[event.id]
+
+
+@handler(MAINTENANCE_CREATED)
+async def update_cost_rollups(db: AsyncSession, event: OutboxEvent) -> None:
+    await record_maintenance_costs(db, [row.id for row in await _maintenances(db, event)])
+
+
+@handler(MAINTENANCE_CREATED)
+async def update_machine_usage(db: AsyncSession, event: OutboxEvent) -> None:
+    rows = await _maintenances(db, event)
+    machines = {row.Machine.id: row.Machine for row in rows}
+    await record_machine_usage(
+        db, event.user_id, machines.values(), [(row.Machine.id, row.data, row.horimetro_no_momento) for row in rows]
+    )
+
+
+@handler(MOVEMENT_CREATED)
+async def update_supply_forecast(db: AsyncSession, event: OutboxEvent) -> None:
+    rows = (await db.execute(
+        select(Movement.supply_id, Movement.tipo, Movement.quantidade, Movement.data)
+        .where(Movement.id.in_(event.payload["ids"]))
+    )).all()
+    await record_supply_consumption(db, event.user_id, rows)
+
+
+@handler(MACHINE_READINGS)
+async def update_usage_from_readings(db: AsyncSession, event: OutboxEvent) -> None:
+    # payload: {"leituras": [[machine_id, data ISO, horimetro], ...]}
+    readings = [
+        (machine_id, datetime.fromisoformat(data), horimetro)
+        for machine_id, data, horimetro in event.payload["leituras"]
+    ]
+    machines = (await db.scalars(
+        select(Machine)
+        .where(Machine.id.in_({machine_id for machine_id, _, _ in readings}))
+        .with_for_update(key_share=True, read=True)
+    )).all()
+    present = {machine.id for machine in machines}
+    await record_machine_usage(db, event.user_id, machines, [r for r in readings if r[0] in present])
+
+
+@handler(MACHINE_STATUS_CHANGED)
+async def alert_status_changes(db: AsyncSession, event: OutboxEvent) -> None:
+    # payload: {"maquinas": [{"id", "nome", "de", "para", "horimetro"}, ...]}.
+    # Alerta no log, uma vez por evento (o marcador de entrega evita repetir na
+    # reentrega); notificações por e-mail ou push assinam o mesmo evento
+    for maquina in event.payload["maquinas"]:
+        logger.log(
+            logging.WARNING if maquina["para"] == "Atenção" else logging.INFO,
+            "usuário %s: máquina %s (%s) passou de %s para %s com %sh",
+            event.user_id, maquina["id"], maquina["nome"], maquina["de"], maquina["para"], maquina["horimetro"],
+        )
+
+
+# ── Execução como processo separado ──────────────────────
+def main():
+    parser = argparse.ArgumentParser(description="Worker do outbox de eventos")
+    parser.add_argument("--once", action="store_true", help="drena a fila uma vez e sai")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    async def run():
+        if args.once:
+            while await drain_once() > 0:
+                pass
+            return
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, stop.set)
+        await run_worker(stop)
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
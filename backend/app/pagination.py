@@ -0,0 +1,77 @@
+import base64
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from fastapi import HTTPException, Response
+from sqlalchemy import literal, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.responses import rows_as_dicts
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+# ── Cursor (data, id) ────────────────────────────────────
+def encode_cursor(data: datetime, row_id: int) -> str:
+    raw = f"{data.isoformat()}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data, row_id = base64.urlsafe_b64decode(padded).decode().split("|")
+        return datetime.fromisoformat(data), int(row_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+
+def _date_bound(db: AsyncSession, data_col, value: datetime):
+    # No SQLite a data é texto em UTC sem fuso e a comparação é de strings: o
+    # limite (cursor, data_inicio) tem de vir no mesmo formato gravado. O server
+    # default (CURRENT_TIMESTAMP) grava "AAAA-MM-DD HH:MM:SS", e o ORM,
+    # "AAAA-MM-DD HH:MM:SS.ffffff"; sem microssegundos, "...SS.000000" ficaria
+    # depois de "...SS" e a linha gravada exatamente no limite ficaria de fora.
+    # Datas com fuso são convertidas para UTC antes; sem fuso já são UTC
+    if db.bind.dialect.name == "sqlite":
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc)
+        value = value.replace(tzinfo=None)
+        return literal(value.strftime("%Y-%m-%d %H:%M:%S" if not value.microsecond else "%Y-%m-%d %H:%M:%S.%f"))
+    return literal(value, data_col.type)
+
+
+async def paginate_history(
+    db: AsyncSession,
+    stmt,
+    data_col,
+    id_col,
+    response: Response,
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    data_inicio: Optional[datetime] = None,
+    data_fim: Optional[datetime] = None,
+):
+    # Ordem decrescente por (data, id); o cursor aponta para a última linha entregue.
+    # stmt seleciona colunas (com "data" e "id"); as linhas voltam como dicts
+    if data_inicio is not None:
+        stmt = stmt.where(data_col >= _date_bound(db, data_col, data_inicio))
+    if data_fim is not None:
+        # data <= fim como data < fim + 1 µs: no SQLite, "...SS.000000" (ORM) e
+        # "...SS" (server default) ficam ambos abaixo do limite
+        stmt = stmt.where(data_col < _date_bound(db, data_col, data_fim + timedelta(microseconds=1)))
+    if cursor:
+        cursor_data, cursor_id = decode_cursor(cursor)
+        cursor_data = _date_bound(db, data_col, cursor_data)
+        # data <= cursor é redundante com a comparação de tuplas, mas é o que o
+        # Postgres sabe usar para podar as partições mensais já percorridas
+        stmt = stmt.where(data_col <= cursor_data, tuple_(data_col, id_col) < tuple_(cursor_data, cursor_id))
+
+    rows = rows_as_dicts(await db.execute(stmt.order_by(data_col.desc(), id_col.desc()).limit(limit + 1)))
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(last["data"], last["id"])
+    return rows
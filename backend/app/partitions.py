@@ -0,0 +1,192 @@
+import asyncio
+import logging
+import re
+from datetime import date, datetime, timezone
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+from app.config import settings
+from app.database import engine as default_engine
+
+logger = logging.getLogger("app.partitions")
+
+# Históricos particionados por mês de `data` no Postgres (migração 0005).
+# No SQLite continuam tabelas comuns e tudo aqui é no-op
+PARTITIONED_TABLES = ("maintenances", "movements")
+# Duas instâncias da API não criam nem desanexam partições ao mesmo tempo
+ADVISORY_LOCK_KEY = 0x7E44A01
+# DETACH sem CONCURRENTLY (o Postgres não aceita com partição padrão) pega trava
+# exclusiva na tabela: desiste rápido em vez de enfileirar as consultas atrás dela
+DETACH_LOCK_TIMEOUT = "5s"
+PARTITION_NAME = re.compile(r"^(?P<table>\w+)_p(?P<year>\d{4})_(?P<month>\d{2})$")
+
+
+# ── Meses e nomes ────────────────────────────────────────
+def month_start(value) -> date:
+    return date(value.year, value.month, 1)
+
+
+def add_months(value: date, months: int) -> date:
+    index = value.year * 12 + value.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_p{month:%Y_%m}"
+
+
+def default_partition_name(table: str) -> str:
+    # Recebe as linhas de meses sem partição (migração 0007): uma manutenção
+    # atrasada na virada do mês não faz os INSERTs falharem
+    return f"{table}_default"
+
+
+def _bound(month: date) -> str:
+    # Limites em UTC: a partição de um mês vai de 00:00Z do dia 1 ao dia 1 seguinte
+    return f"'{month.isoformat()} 00:00:00+00'"
+
+
+# ── Operações (conexão síncrona) ─────────────────────────
+def partitioned_tables(conn: Connection) -> list[str]:
+    if conn.dialect.name != "postgresql":
+        return []
+    return list(conn.scalars(text(
+        "SELECT c.relname FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid "
+        "WHERE c.relnamespace = current_schema()::regnamespace AND c.relname = ANY(:tables)"
+    ), {"tables": list(PARTITIONED_TABLES)}))
+
+
+def _partitions(conn: Connection, table: str) -> dict[str, bool]:
+    # Partições anexadas -> DETACH ... CONCURRENTLY interrompido no meio (pendente)
+    return dict(conn.execute(text(
+        "SELECT c.relname, i.inhdetachpending FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = CAST(:table AS regclass) ORDER BY c.relname"
+    ), {"table": table}).all())
+
+
+def _create_partition(conn: Connection, table: str, month: date, has_default: bool) -> str:
+    name = partition_name(table, month)
+    bounds = f"FROM ({_bound(month)}) TO ({_bound(add_months(month, 1))})"
+    in_month = f"data >= {_bound(month)} AND data < {_bound(add_months(month, 1))}"
+    default = default_partition_name(table)
+    if not has_default or not conn.scalar(text(f"SELECT EXISTS (SELECT 1 FROM {default} WHERE {in_month})")):
+        conn.execute(text(f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {table} FOR VALUES {bounds}"))
+        return name
+    # O mês já tem linhas na partição padrão, e o Postgres não cria a partição
+    # por cima delas: desanexa a padrão, cria o mês, move as linhas e reanexa.
+    # Um único DO é uma transação só, mesmo em AUTOCOMMIT; trava a tabela pelo
+    # tempo de mover as linhas atrasadas, que são poucas
+    conn.execute(text(f"""
+        DO $$ BEGIN
+            ALTER TABLE {table} DETACH PARTITION {default};
+            CREATE TABLE {name} PARTITION OF {table} FOR VALUES {bounds};
+            INSERT INTO {table} SELECT * FROM {default} WHERE {in_month};
+            DELETE FROM {default} WHERE {in_month};
+            ALTER TABLE {table} ATTACH PARTITION {default} DEFAULT;
+        END $$
+    """))
+    return name
+
+
+def ensure_partitions(conn: Connection, start, end) -> list[str]:
+    # Cria as partições mensais que faltam para cobrir [start, end]
+    created = []
+    for table in partitioned_tables(conn):
+        existing = _partitions(conn, table)
+        has_default = default_partition_name(table) in existing
+        month = month_start(start)
+        while month <= month_start(end):
+            if partition_name(table, month) not in existing:
+                created.append(_create_partition(conn, table, month, has_default))
+            month = add_months(month, 1)
+    return created
+
+
+def archive_partitions(conn: Connection, before: date) -> list[str]:
+    # Desanexa as partições de meses anteriores a `before` e as move para o esquema
+    # de arquivo: saem das consultas e do vacuum do histórico, mas continuam no
+    # banco para backup (pg_dump -n) ou DROP. DETACH e SET SCHEMA vão num único DO,
+    # atômico. Sem trava disponível em DETACH_LOCK_TIMEOUT, falha e a próxima
+    # rodada tenta de novo
+    archived = []
+    schema = settings.PARTITION_ARCHIVE_SCHEMA
+    for table in partitioned_tables(conn):
+        # Além das anexadas, sobras de versões que desanexavam com CONCURRENTLY:
+        # DETACH interrompido (pendente até o FINALIZE; qualquer outro DETACH na
+        # tabela falha) ou já desanexada mas ainda no esquema atual
+        candidates = {name: "pendente" if pending else "anexada" for name, pending in _partitions(conn, table).items()}
+        for name in conn.scalars(text(
+            "SELECT relname FROM pg_class WHERE relnamespace = current_schema()::regnamespace "
+            "AND relkind = 'r' AND NOT relispartition AND starts_with(relname, :prefix)"
+        ), {"prefix": f"{table}_p"}):
+            candidates[name] = "desanexada"
+
+        for name, state in sorted(candidates.items()):
+            match = PARTITION_NAME.match(name)
+            if not match or match["table"] != table:
+                continue
+            month = date(int(match["year"]), int(match["month"]), 1)
+            if add_months(month, 1) > before:
+                continue
+            conn.execute(text(f"CREATE SCHEMA IF NOT EXISTS {schema}"))
+            if state == "pendente":
+                conn.execute(text(f"ALTER TABLE {table} DETACH PARTITION {name} FINALIZE"))
+            if state == "anexada":
+                conn.execute(text(f"""
+                    DO $$ BEGIN
+                        SET LOCAL lock_timeout = '{DETACH_LOCK_TIMEOUT}';
+                        ALTER TABLE {table} DETACH PARTITION {name};
+                        ALTER TABLE {name} SET SCHEMA {schema};
+                    END $$
+                """))
+            else:
+                conn.execute(text(f"ALTER TABLE {name} SET SCHEMA {schema}"))
+            archived.append(f"{schema}.{name}")
+    return archived
+
+
+def maintain_partitions(bind: Optional[Engine] = None) -> tuple[list[str], list[str]]:
+    # Mantém PARTITION_MONTHS_AHEAD meses à frente e arquiva o que passou de
+    # PARTITION_RETENTION_MONTHS (0 = nunca arquiva)
+    bind = bind or default_engine
+    if bind.dialect.name != "postgresql":
+        return [], []
+    with bind.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        if not conn.scalar(text("SELECT pg_try_advisory_lock(:key)"), {"key": ADVISORY_LOCK_KEY}):
+            return [], []
+        try:
+            today = month_start(datetime.now(timezone.utc))
+            created = ensure_partitions(conn, today, add_months(today, settings.PARTITION_MONTHS_AHEAD))
+            archived = []
+            if settings.PARTITION_RETENTION_MONTHS > 0:
+                archived = archive_partitions(conn, add_months(today, -settings.PARTITION_RETENTION_MONTHS))
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": ADVISORY_LOCK_KEY})
+    if created or archived:
+        logger.info("partições criadas: %s; arquivadas: %s", created, archived)
+    return created, archived
+
+
+async def run_maintenance(stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        try:
+            await asyncio.to_thread(maintain_partitions)
+        except Exception:
+            logger.exception("falha na manutenção de partições")
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=settings.PARTITION_MAINTENANCE_INTERVAL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+
+
+# ── Execução avulsa (cron) ───────────────────────────────
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    created, archived = maintain_partitions()
+    print(f"criadas: {len(created)}, arquivadas: {len(archived)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+# Limites (ms) do histograma de espera por conexão
+WAIT_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 5000)
+
+
+# ── Métricas do pool de conexões ─────────────────────────
+class PoolMetrics:
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self.connects = 0
+        self.checkouts = 0
+        self.checkins = 0
+        self.invalidations = 0
+        self.timeouts = 0
+        self.in_use = 0
+        self.max_in_use = 0
+        self.wait_count = 0
+        self.wait_total_ms = 0.0
+        self.wait_max_ms = 0.0
+        self.wait_buckets = [0] * (len(WAIT_BUCKETS_MS) + 1)
+
+    def observe_wait(self, elapsed_ms: float, timed_out: bool = False) -> None:
+        with self._lock:
+            self.wait_count += 1
+            self.wait_total_ms += elapsed_ms
+            self.wait_max_ms = max(self.wait_max_ms, elapsed_ms)
+            for i, limit in enumerate(WAIT_BUCKETS_MS):
+                if elapsed_ms <= limit:
+                    self.wait_buckets[i] += 1
+                    break
+            else:
+                self.wait_buckets[-1] += 1
+            if timed_out:
+                self.timeouts += 1
+
+    def on_connect(self, *_) -> None:
+        with self._lock:
+            self.connects += 1
+
+    def on_checkout(self, *_) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self.in_use += 1
+            self.max_in_use = max(self.max_in_use, self.in_use)
+
+    def on_checkin(self, *_) -> None:
+        with self._lock:
+            self.checkins += 1
+            self.in_use = max(self.in_use - 1, 0)
+
+    def on_invalidate(self, *_) -> None:
+        with self._lock:
+            self.invalidations += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "connects": self.connects,
+                "checkouts": self.checkouts,
+                "checkins": self.checkins,
+                "invalidations": self.invalidations,
+                "timeouts": self.timeouts,
+                "in_use": self.in_use,
+                "max_in_use": self.max_in_use,
+                "wait_count": self.wait_count,
+                "wait_avg_ms": self.wait_total_ms / self.wait_count if self.wait_count else 0.0,
+                "wait_max_ms": self.wait_max_ms,
+                "wait_buckets_ms": {
+                    **{str(limit): count for limit, count in zip(WAIT_BUCKETS_MS, self.wait_buckets)},
+                    "+Inf": self.wait_buckets[-1],
+                },
+            }
+
+
+def timed_pool_class(base, metrics: PoolMetrics):
+    # Mede o tempo até obter uma conexão do pool (fila + conexão nova, se houver)
+    class TimedPool(base):
+        def _do_get(self):
+            started = time.perf_counter()
+            try:
+                conn = super()._do_get()
+            except PoolTimeoutError:
+                metrics.observe_wait((time.perf_counter() - started) * 1000, timed_out=True)
+                raise
+            metrics.observe_wait((time.perf_counter() - started) * 1000)
+            return conn
+
+    TimedPool.__name__ = f"Timed{base.__name__}"
+    return TimedPool
+
+
+def instrument_pool(engine, metrics: PoolMetrics) -> None:
+    event.listen(engine, "connect", metrics.on_connect)
+    event.listen(engine, "checkout", metrics.on_checkout)
+    event.listen(engine, "checkin", metrics.on_checkin)
+    event.listen(engine, "invalidate", metrics.on_invalidate)
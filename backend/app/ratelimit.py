@@ -0,0 +1,172 @@
+import asyncio
+import importlib
+import math
+import time
+from dataclasses import dataclass
+from typing import Protocol
+
+from fastapi import Depends, HTTPException, Request
+
+from app.auth import Principal, get_current_user
+from app.cache import TTLCache
+from app.config import settings
+from app.responses import dump_json
+
+
+# ── Orçamentos (balde de fichas) ─────────────────────────
+@dataclass(frozen=True)
+class Budget:
+    capacity: float  # rajada máxima
+    per_second: float  # fichas repostas por segundo
+
+    @classmethod
+    def per_minute(cls, requests: float, burst: float) -> "Budget":
+        return cls(capacity=burst, per_second=requests / 60)
+
+
+READ = Budget.per_minute(settings.RATE_LIMIT_READ_PER_MINUTE, settings.RATE_LIMIT_READ_BURST)
+WRITE = Budget.per_minute(settings.RATE_LIMIT_WRITE_PER_MINUTE, settings.RATE_LIMIT_WRITE_BURST)
+# Login e cadastro rodam bcrypt (caro de propósito): orçamento bem menor, antes do hash
+LOGIN = Budget.per_minute(settings.RATE_LIMIT_LOGIN_PER_MINUTE, settings.RATE_LIMIT_LOGIN_BURST)
+LOGIN_IP = Budget.per_minute(settings.RATE_LIMIT_LOGIN_IP_PER_MINUTE, settings.RATE_LIMIT_LOGIN_IP_BURST)
+
+# Rotas com orçamento próprio, pelo caminho do FastAPI; as demais usam READ ou WRITE
+ROUTE_BUDGETS = {
+    # Lotes de até MAX_BULK_ITEMS linhas
+    "POST /api/maintenance/bulk": Budget.per_minute(10, 5),
+    "POST /api/movements/bulk": Budget.per_minute(10, 5),
+    # Exportam o histórico inteiro em stream, segurando uma conexão do início ao fim
+    "GET /api/export/maintenance": Budget.per_minute(2, 2),
+    "GET /api/export/movements": Budget.per_minute(2, 2),
+    # Só acumula em memória; gateways de uma fazenda inteira mandam pelo mesmo usuário
+    "POST /api/telemetry": Budget.per_minute(600, 120),
+}
+
+
+# ── Backends ─────────────────────────────────────────────
+class RateLimitBackend(Protocol):
+    # Consome `cost` fichas do balde `key`; devolve 0 se admitiu, senão quantos
+    # segundos faltam para haver fichas
+    async def take(self, key: str, budget: Budget, cost: float = 1) -> float: ...
+
+
+class MemoryBackend:
+    # Baldes no próprio processo (padrão). Um balde parado por mais que o TTL já
+    # estaria cheio, então perdê-lo não muda nada
+    def __init__(self, maxsize: int, ttl: float = 3600):
+        self._buckets = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    async def take(self, key: str, budget: Budget, cost: float = 1) -> float:
+        now = time.monotonic()
+        tokens, updated = self._buckets.get(key, (budget.capacity, now))
+        tokens = min(budget.capacity, tokens + (now - updated) * budget.per_second)
+        if tokens >= cost:
+            self._buckets.set(key, (tokens - cost, now))
+            return 0.0
+        self._buckets.set(key, (tokens, now))
+        return (cost - tokens) / budget.per_second
+
+
+def load_backend(path: str) -> RateLimitBackend:
+    # "modulo:fabrica" para baldes compartilhados entre instâncias (ex.: Redis); vazio = memória
+    if not path:
+        return MemoryBackend(settings.RATE_LIMIT_MAX_KEYS)
+    module, _, attr = path.partition(":")
+    return getattr(importlib.import_module(module), attr)()
+
+
+backend = load_backend(settings.RATE_LIMIT_BACKEND)
+
+
+# ── Limites por usuário e por rota ───────────────────────
+async def check(key: str, budget: Budget, cost: float = 1) -> None:
+    if not settings.RATE_LIMIT_ENABLED:
+        return
+    wait = await backend.take(key, budget, cost)
+    if wait > 0:
+        raise HTTPException(
+            status_code=429,
+            detail="Muitas requisições; tente novamente em instantes",
+            headers={"Retry-After": str(math.ceil(wait))},
+        )
+
+
+def route_budget(request: Request) -> tuple[str, Budget]:
+    path = getattr(request.scope.get("route"), "path", request.url.path)
+    name = f"{request.method} {path}"
+    default = READ if request.method in ("GET", "HEAD") else WRITE
+    return name, ROUTE_BUDGETS.get(name, default)
+
+
+async def rate_limit(request: Request, user: Principal = Depends(get_current_user)) -> None:
+    # Dependência dos routers autenticados (main.py), antes de qualquer consulta da
+    # rota. Um balde por usuário (sub do JWT) e rota: um tablet em laço no POST de
+    # movimentações esgota só aquela rota, e as leituras dele seguem funcionando
+    name, budget = route_budget(request)
+    await check(f"rl:{user.id}:{name}", budget)
+
+
+async def login_rate_limit(request: Request, email: str) -> None:
+    # Antes do bcrypt. O balde apertado é por (IP, e-mail): quem divide o IP da
+    # fazenda (NAT) não esgota o login dos colegas. Por IP só um teto folgado,
+    # contra um endereço testando muitas contas, e por e-mail contra tentativas
+    # distribuídas em uma mesma conta. Atrás de proxy, rodar o uvicorn com
+    # --proxy-headers, senão todos os clientes viram o IP do proxy
+    client = request.client.host if request.client else "desconhecido"
+    email = email.lower()
+    await check(f"rl:login:ip:{client}", LOGIN_IP)
+    await check(f"rl:login:ip-email:{client}:{email}", LOGIN)
+    await check(f"rl:login:email:{email}", LOGIN)
+
+
+# ── Admissão global ──────────────────────────────────────
+class AdmissionMiddleware:
+    # Limita as requisições em andamento neste processo à capacidade do pool de
+    # conexões. O excesso espera numa fila curta; com a fila cheia ou a espera
+    # esgotada, recebe 503 na hora, em vez de ficar até DB_POOL_TIMEOUT esperando
+    # uma conexão e segurar memória e sockets
+    def __init__(self, app, max_concurrent: int, queue_size: int, queue_timeout: float, exempt_paths=()):
+        self.app = app
+        self.slots = asyncio.Semaphore(max_concurrent)
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.exempt_paths = frozenset(exempt_paths)
+        self.waiting = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.exempt_paths:
+            await self.app(scope, receive, send)
+            return
+
+        if self.slots.locked():
+            if self.waiting >= self.queue_size:
+                await self._reject(send)
+                return
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self.slots.acquire(), timeout=self.queue_timeout)
+            except asyncio.TimeoutError:
+                await self._reject(send)
+                return
+            finally:
+                self.waiting -= 1
+        else:
+            await self.slots.acquire()
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.slots.release()
+
+    async def _reject(self, send) -> None:
+        body = dump_json({"detail": "Servidor sobrecarregado; tente novamente em instantes"})
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", b"1"),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
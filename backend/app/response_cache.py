@@ -0,0 +1,123 @@
+import importlib
+from typing import Any, Optional, Protocol
+
+from fastapi import Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.cache import TTLCache
+from app.config import settings
+from app.responses import dump_json, raw_json_response, rows_as_dicts
+
+
+# ── Backends ─────────────────────────────────────────────
+class CacheBackend(Protocol):
+    async def get(self, key: str) -> Optional[Any]: ...
+
+    async def set(self, key: str, value: Any) -> None: ...
+
+    async def delete(self, key: str) -> None: ...
+
+
+class MemoryBackend:
+    # LRU com TTL no próprio processo (padrão)
+    def __init__(self, maxsize: int, ttl: float):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    async def get(self, key: str) -> Optional[Any]:
+        return self._cache.get(key)
+
+    async def set(self, key: str, value: Any) -> None:
+        self._cache.set(key, value)
+
+    async def delete(self, key: str) -> None:
+        self._cache.pop(key)
+
+    def clear(self) -> None:
+        self._cache.clear()
+
+
+def load_backend(path: str) -> CacheBackend:
+    # "modulo:fabrica" para um backend compartilhado (ex.: Redis); vazio = memória
+    if not path:
+        return MemoryBackend(settings.RESPONSE_CACHE_SIZE, settings.RESPONSE_CACHE_TTL_SECONDS)
+    module, _, attr = path.partition(":")
+    return getattr(importlib.import_module(module), attr)()
+
+
+# ── Cache de respostas por usuário ───────────────────────
+def canonical_query(request: Request) -> str:
+    return "&".join(sorted(f"{k}={v}" for k, v in request.query_params.multi_items()))
+
+
+def variant_key(params: dict) -> str:
+    # Só os parâmetros que a rota aceita, já validados: parâmetros a mais na URL
+    # (ex.: ?_=timestamp contra cache do navegador) não criam variantes novas
+    return "&".join(f"{k}={v}" for k, v in sorted(params.items()) if v is not None)
+
+
+class ResponseCache:
+    # Uma entrada por (usuário, coleção) com a versão da coleção e as variantes
+    # (filtros); invalidar o usuário remove todas de uma vez. Acima de
+    # max_variants, a variante gravada há mais tempo sai
+    def __init__(self, backend: CacheBackend, enabled: bool = True, max_variants: int = 8):
+        self.backend = backend
+        self.enabled = enabled
+        self.max_variants = max_variants
+
+    @staticmethod
+    def _key(user_id: int, collection: str) -> str:
+        return f"resp:{user_id}:{collection}"
+
+    async def get(self, user_id: int, collection: str, version: int, variant: str) -> Optional[bytes]:
+        if not self.enabled:
+            return None
+        entry = await self.backend.get(self._key(user_id, collection))
+        if entry is None or entry["version"] != version:
+            return None
+        return entry["variants"].get(variant)
+
+    async def set(self, user_id: int, collection: str, version: int, variant: str, payload: bytes) -> None:
+        if not self.enabled:
+            return
+        key = self._key(user_id, collection)
+        entry = await self.backend.get(key)
+        variants = dict(entry["variants"]) if entry is not None and entry["version"] == version else {}
+        variants.pop(variant, None)
+        variants[variant] = payload
+        while len(variants) > self.max_variants:
+            del variants[next(iter(variants))]
+        await self.backend.set(key, {"version": version, "variants": variants})
+
+    async def invalidate(self, user_id: int, *collections: str) -> None:
+        if not self.enabled:
+            return
+        for collection in collections:
+            await self.backend.delete(self._key(user_id, collection))
+
+
+response_cache = ResponseCache(
+    load_backend(settings.RESPONSE_CACHE_BACKEND),
+    settings.RESPONSE_CACHE_ENABLED,
+    settings.RESPONSE_CACHE_MAX_VARIANTS,
+)
+
+
+async def cached_list(
+    request: Request,
+    response: Response,
+    user_id: int,
+    collection: str,
+    db: AsyncSession,
+    stmt,
+    params: Optional[dict] = None,
+) -> Response:
+    # A versão vem de conditional_get; escritas concorrentes mudam a versão e
+    # a entrada antiga deixa de ser servida, mesmo em outro processo.
+    # params: os filtros da rota que mudam o resultado
+    version = request.state.collection_versions[collection]
+    variant = variant_key(params or {})
+    payload = await response_cache.get(user_id, collection, version, variant)
+    if payload is None:
+        payload = dump_json(rows_as_dicts(await db.execute(stmt)))
+        await response_cache.set(user_id, collection, version, variant, payload)
+    return raw_json_response(payload, response)
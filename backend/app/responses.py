@@ -0,0 +1,40 @@
+from typing import Any
+
+import orjson
+from fastapi import Response
+from fastapi.responses import ORJSONResponse
+
+# Datas UTC saem com "Z", como no serializador do Pydantic
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_UTC_Z
+
+
+class FastJSONResponse(ORJSONResponse):
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=ORJSON_OPTIONS)
+
+
+def dump_json(content: Any) -> bytes:
+    return orjson.dumps(content, option=ORJSON_OPTIONS)
+
+
+def rows_as_dicts(result) -> list[dict]:
+    # Linhas de um select de colunas (com labels = campos do schema) como dicts
+    keys = list(result.keys())
+    return [dict(zip(keys, row)) for row in result]
+
+
+# ── Caminho rápido de leitura ────────────────────────────
+# As rotas de listagem selecionam só as colunas do schema de saída e devolvem
+# a resposta pronta: sem hidratar objetos ORM nem validar de novo no Pydantic.
+# O response_model continua na rota para a documentação OpenAPI.
+def json_response(content: Any, response: Response) -> Response:
+    fast = FastJSONResponse(content)
+    # Cabeçalhos definidos por dependências (ETag, cursor) na resposta injetada
+    fast.headers.raw.extend(response.headers.raw)
+    return fast
+
+
+def raw_json_response(payload: bytes, response: Response) -> Response:
+    raw = Response(payload, media_type="application/json")
+    raw.headers.raw.extend(response.headers.raw)
+    return raw
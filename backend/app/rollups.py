@@ -0,0 +1,107 @@
+import argparse
+import asyncio
+from datetime import date, datetime
+from typing import Iterable
+
+from sqlalchemy import case, delete, func, literal_column, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal, dialect_insert
+from app.models import Maintenance, MaintenanceCostRollup
+
+
+def month_start(value: datetime) -> date:
+    return date(value.year, value.month, 1)
+
+
+ROLLUP_COLUMNS = ["machine_id", "mes", "quantidade", "custo_total", "ultimo_horimetro", "ultima_data"]
+
+
+def _month_expression(bind, column):
+    # Mês da manutenção em UTC, o mesmo no caminho incremental e no recálculo.
+    # No Postgres date_trunc usaria o fuso da sessão; no SQLite a data já é UTC
+    if bind.dialect.name == "postgresql":
+        return func.date_trunc("month", func.timezone("UTC", column)).cast(MaintenanceCostRollup.mes.type)
+    return func.date(column, literal_column("'start of month'"))
+
+
+def _aggregate(bind, *criteria):
+    # INSERT ... SELECT não passa pelo filtro de excluídos do ORM: deleted_at explícito
+    mes = _month_expression(bind, Maintenance.data)
+    return (
+        select(
+            Maintenance.machine_id,
+            mes,
+            func.count(Maintenance.id),
+            func.coalesce(func.sum(Maintenance.custo), 0),
+            func.max(Maintenance.horimetro_no_momento),
+            func.max(Maintenance.data),
+        )
+        .where(Maintenance.deleted_at.is_(None), *criteria)
+        .group_by(Maintenance.machine_id, mes)
+    )
+
+
+def _upsert_statement(bind, aggregate):
+    stmt = dialect_insert(bind, MaintenanceCostRollup).from_select(ROLLUP_COLUMNS, aggregate)
+    rollup = MaintenanceCostRollup.__table__.c
+    return stmt.on_conflict_do_update(
+        index_elements=[rollup.machine_id, rollup.mes],
+        set_={
+            "quantidade": rollup.quantidade + stmt.excluded.quantidade,
+            "custo_total": rollup.custo_total + stmt.excluded.custo_total,
+            "ultimo_horimetro": case(
+                (stmt.excluded.ultimo_horimetro > rollup.ultimo_horimetro, stmt.excluded.ultimo_horimetro),
+                else_=rollup.ultimo_horimetro,
+            ),
+            "ultima_data": case(
+                (stmt.excluded.ultima_data > rollup.ultima_data, stmt.excluded.ultima_data),
+                else_=rollup.ultima_data,
+            ),
+        },
+    )
+
+
+async def record_maintenance_costs(db: AsyncSession, maintenance_ids: Iterable[int]) -> None:
+    # Soma as manutenções recém-inseridas ao agregado, na mesma transação, com a
+    # mesma agregação do recálculo completo
+    maintenance_ids = list(maintenance_ids)
+    if maintenance_ids:
+        await db.execute(_upsert_statement(db.bind, _aggregate(db.bind, Maintenance.id.in_(maintenance_ids))))
+
+
+def rebuild_cost_rollups(db: Session) -> None:
+    # Recalcula o agregado a partir do histórico completo (seeds, migrações, correções)
+    db.execute(delete(MaintenanceCostRollup))
+    db.execute(MaintenanceCostRollup.__table__.insert().from_select(ROLLUP_COLUMNS, _aggregate(db.bind)))
+
+
+# ── Recálculo avulso ─────────────────────────────────────
+def main():
+    # Preenche os agregados e previsões de bancos que já tinham histórico antes da
+    # migração 0002 (ela só cria as tabelas) ou corrige divergências. Rodar com a
+    # API parada: eventos que chegassem durante o recálculo seriam somados duas vezes
+    parser = argparse.ArgumentParser(description="Agregados de custo e previsões")
+    parser.add_argument("comando", choices=["rebuild"], help="recalcula tudo a partir do histórico")
+    parser.parse_args()
+
+    from app.forecasting import rebuild_machine_forecasts, rebuild_supply_forecasts
+    from app.outbox import drain_once
+
+    async def drain():
+        # Eventos pendentes entram no histórico agora; processados depois, contariam em dobro
+        while await drain_once() > 0:
+            pass
+
+    asyncio.run(drain())
+    with SessionLocal() as db:
+        rebuild_cost_rollups(db)
+        supplies = rebuild_supply_forecasts(db)
+        machines = rebuild_machine_forecasts(db)
+        db.commit()
+    print(f"agregados de custo recalculados; previsões: {supplies} insumos, {machines} máquinas")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+from datetime import date
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+
+from app.database import get_db
+from app.models import Machine, MaintenanceCostRollup
+from app.rollups import month_start
+from app.schemas import CostReportRow
+from app.auth import Principal, get_current_user
+
+router = APIRouter(tags=["Análises"])
+
+GROUPINGS = ("maquina", "tipo", "mes", "maquina_mes")
+
+
+@router.get("/custos", response_model=List[CostReportRow])
+async def cost_report(
+    agrupar: str = Query("maquina"),
+    mes_inicio: Optional[date] = None,
+    mes_fim: Optional[date] = None,
+    machine_id: Optional[int] = None,
+    db: AsyncSession = Depends(get_db),
+    user: Principal = Depends(get_current_user),
+):
+    if agrupar not in GROUPINGS:
+        raise HTTPException(status_code=400, detail=f"agrupar deve ser um de: {', '.join(GROUPINGS)}")
+
+    # Lê apenas o agregado (máquina x mês), nunca o histórico de manutenções
+    rollup = MaintenanceCostRollup
+    keys = {
+        "maquina": [Machine.id, Machine.nome, Machine.tipo],
+        "tipo": [Machine.tipo],
+        "mes": [rollup.mes],
+        "maquina_mes": [Machine.id, Machine.nome, Machine.tipo, rollup.mes],
+    }[agrupar]
+
+    quantidade = func.sum(rollup.quantidade)
+    custo_total = func.sum(rollup.custo_total)
+    stmt = (
+        select(
+            *keys,
+            quantidade.label("quantidade"),
+            custo_total.label("custo_total"),
+            func.max(rollup.ultimo_horimetro).label("ultimo_horimetro"),
+            func.max(rollup.ultima_data).label("ultima_data"),
+        )
+        .join(Machine, Machine.id == rollup.machine_id)
+        .where(Machine.user_id == user.id)
+        .group_by(*keys)
+        .order_by(*keys)
+    )
+    if mes_inicio is not None:
+        stmt = stmt.where(rollup.mes >= month_start(mes_inicio))
+    if mes_fim is not None:
+        stmt = stmt.where(rollup.mes <= month_start(mes_fim))
+    if machine_id is not None:
+        stmt = stmt.where(rollup.machine_id == machine_id)
+
+    rows = (await db.execute(stmt)).mappings().all()
+    return [
+        {
+            "machine_id": row.get("id"),
+            "nome": row.get("nome"),
+            "tipo": row.get("tipo"),
+            "mes": row.get("mes"),
+            "quantidade": row["quantidade"],
+            "custo_total": row["custo_total"],
+            "custo_medio": row["custo_total"] / row["quantidade"] if row["quantidade"] else 0,
+            "ultimo_horimetro": row["ultimo_horimetro"],
+            "ultima_data": row["ultima_data"],
+        }
+        for row in rows
+    ]
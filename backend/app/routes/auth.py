@@ -1,40 +1,91 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import get_db
 from app.models import User
-from app.schemas import UserCreate, UserLogin, UserOut, Token
-from app.auth import hash_password, verify_password, create_access_token, get_current_user
+from app.schemas import PasswordChange, UserCreate, UserLogin, UserOut, Token
+from app.auth import (
+    Principal,
+    hash_password_async,
+    verify_and_update_password_async,
+    create_access_token,
+    invalidate_user_cache,
+    token_claims,
+    get_current_user,
+)
+from app.ratelimit import login_rate_limit, rate_limit
 
 router = APIRouter(tags=["Auth"])
 
 
 @router.post("/register", response_model=UserOut, status_code=status.HTTP_201_CREATED)
-def register(data: UserCreate, db: Session = Depends(get_db)):
-    if db.query(User).filter(User.email == data.email).first():
+async def register(data: UserCreate, request: Request, db: AsyncSession = Depends(get_db)):
+    await login_rate_limit(request, data.email)
+    if await db.scalar(select(User).where(User.email == data.email)):
         raise HTTPException(status_code=400, detail="E-mail já cadastrado")
 
     user = User(
         name=data.name,
         email=data.email,
-        hashed_password=hash_password(data.password),
+        hashed_password=await hash_password_async(data.password),
     )
     db.add(user)
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
     return user
 
 
 @router.post("/login", response_model=Token)
-def login(data: UserLogin, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == data.email).first()
-    if not user or not verify_password(data.password, user.hashed_password):
+async def login(data: UserLogin, request: Request, db: AsyncSession = Depends(get_db)):
+    # Antes da consulta e do bcrypt, que é justamente o custo a proteger
+    await login_rate_limit(request, data.email)
+    user = await db.scalar(select(User).where(User.email == data.email))
+    if not user:
         raise HTTPException(status_code=401, detail="E-mail ou senha incorretos")
 
-    token = create_access_token({"sub": user.id})
+    valid, new_hash = await verify_and_update_password_async(data.password, user.hashed_password)
+    if not valid:
+        raise HTTPException(status_code=401, detail="E-mail ou senha incorretos")
+    if new_hash:
+        # Custo do bcrypt mudou desde o cadastro: regrava o hash de forma transparente
+        user.hashed_password = new_hash
+        await db.commit()
+
+    token = create_access_token(token_claims(user))
     return {"access_token": token, "token_type": "bearer"}
 
 
-@router.get("/me", response_model=UserOut)
-def read_users_me(current_user: User = Depends(get_current_user)):
-    return current_user
+@router.get("/me", response_model=UserOut, dependencies=[Depends(rate_limit)])
+async def read_users_me(current_user: Principal = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    # O principal não carrega `created_at`; /me é a única rota que precisa da linha completa
+    user = await db.scalar(select(User).where(User.id == current_user.id))
+    if user is None:
+        raise HTTPException(status_code=401, detail="Credenciais inválidas")
+    return user
+
+
+@router.put("/me/password", response_model=Token)
+async def change_password(
+    data: PasswordChange,
+    request: Request,
+    current_user: Principal = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    # Revoga os tokens anteriores (inclusive o desta requisição) e devolve um novo
+    await login_rate_limit(request, current_user.email)
+    user = await db.scalar(select(User).where(User.id == current_user.id))
+    if user is None:
+        raise HTTPException(status_code=401, detail="Credenciais inválidas")
+
+    valid, _ = await verify_and_update_password_async(data.current_password, user.hashed_password)
+    if not valid:
+        raise HTTPException(status_code=400, detail="Senha atual incorreta")
+
+    user.hashed_password = await hash_password_async(data.new_password)
+    user.token_version = User.token_version + 1
+    await db.commit()
+    await db.refresh(user)
+    # Só depois do commit: antes, outra requisição recolocaria a versão antiga no cache
+    invalidate_user_cache(user.id)
+    return {"access_token": create_access_token(token_claims(user)), "token_type": "bearer"}
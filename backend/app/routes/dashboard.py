@@ -0,0 +1,129 @@
+from datetime import datetime, timedelta, timezone
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import case, func, literal, select, true, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import get_db
+from app.models import Machine, Maintenance, Supply
+from app.schemas import DashboardOut
+from app.auth import Principal, get_current_user
+
+router = APIRouter(tags=["Dashboard"])
+
+
+def _count_when(condition):
+    return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
+
+
+@router.get("", response_model=DashboardOut)
+async def get_dashboard(
+    dias: int = Query(30, ge=1, le=365),
+    db: AsyncSession = Depends(get_db),
+    user: Principal = Depends(get_current_user),
+):
+    since = datetime.now(timezone.utc) - timedelta(days=dias)
+
+    machine_counts = (
+        select(
+            func.count(Machine.id).label("maquinas_total"),
+            _count_when(Machine.status == "OK").label("maquinas_ok"),
+            _count_when(Machine.status == "Próximo").label("maquinas_proximo"),
+            _count_when(Machine.status == "Atenção").label("maquinas_atencao"),
+        )
+        .where(Machine.user_id == user.id)
+        .subquery()
+    )
+    supply_counts = (
+        select(
+            func.count(Supply.id).label("insumos_total"),
+            _count_when(Supply.status == "OK").label("insumos_ok"),
+            _count_when(Supply.status == "Estoque Baixo").label("insumos_estoque_baixo"),
+        )
+        .where(Supply.user_id == user.id)
+        .subquery()
+    )
+    recent_cost = (
+        select(
+            func.count(Maintenance.id).label("manutencoes_recentes"),
+            func.coalesce(func.sum(Maintenance.custo), 0).label("custo_recente"),
+        )
+        .join(Machine, Machine.id == Maintenance.machine_id)
+        .where(Machine.user_id == user.id, Maintenance.data >= since)
+        .subquery()
+    )
+    summary = (
+        select(machine_counts, supply_counts, recent_cost)
+        .select_from(machine_counts.join(supply_counts, true()).join(recent_cost, true()))
+        .subquery()
+    )
+
+    # Itens em alerta das duas tabelas numa única relação
+    alerts = union_all(
+        select(
+            literal("maquina").label("origem"),
+            Machine.id.label("id"),
+            Machine.nome.label("nome"),
+            Machine.tipo.label("detalhe"),
+            Machine.horimetro_atual.label("atual"),
+            Machine.proxima_manutencao.label("limite"),
+            Machine.status.label("status"),
+        ).where(Machine.user_id == user.id, Machine.status != "OK"),
+        select(
+            literal("insumo"),
+            Supply.id,
+            Supply.nome,
+            Supply.unidade,
+            Supply.quantidade_atual,
+            Supply.quantidade_minima,
+            Supply.status,
+        ).where(Supply.user_id == user.id, Supply.status != "OK"),
+    ).subquery()
+
+    # Um único round-trip: o resumo (sempre uma linha) junto com os alertas
+    rows = (await db.execute(
+        select(summary, alerts)
+        .select_from(summary.outerjoin(alerts, true()))
+        .order_by(alerts.c.origem, alerts.c.status, alerts.c.nome)
+    )).mappings().all()
+
+    first = rows[0]
+    maquinas_alerta = []
+    insumos_alerta = []
+    for row in rows:
+        if row["origem"] == "maquina":
+            maquinas_alerta.append({
+                "id": row["id"],
+                "nome": row["nome"],
+                "tipo": row["detalhe"],
+                "horimetro_atual": row["atual"],
+                "proxima_manutencao": row["limite"],
+                "status": row["status"],
+            })
+        elif row["origem"] == "insumo":
+            insumos_alerta.append({
+                "id": row["id"],
+                "nome": row["nome"],
+                "unidade": row["detalhe"],
+                "quantidade_atual": row["atual"],
+                "quantidade_minima": row["limite"],
+                "status": row["status"],
+            })
+
+    return {
+        "maquinas": {
+            "total": first["maquinas_total"],
+            "ok": first["maquinas_ok"],
+            "proximo": first["maquinas_proximo"],
+            "atencao": first["maquinas_atencao"],
+        },
+        "insumos": {
+            "total": first["insumos_total"],
+            "ok": first["insumos_ok"],
+            "estoque_baixo": first["insumos_estoque_baixo"],
+        },
+        "manutencoes_recentes": first["manutencoes_recentes"],
+        "custo_manutencao_recente": first["custo_recente"],
+        "dias": dias,
+        "maquinas_alerta": maquinas_alerta,
+        "insumos_alerta": insumos_alerta,
+    }
@@ -0,0 +1,133 @@
+import csv
+import enum
+import io
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from typing import Optional
+
+from app.database import AsyncSessionLocal
+from app.models import Machine, Maintenance, Movement, Supply
+from app.auth import Principal, get_current_user
+from app.responses import dump_json
+
+router = APIRouter(tags=["Exportação"])
+
+EXPORT_FORMATS = {
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "csv": ("text/csv; charset=utf-8", "csv"),
+}
+# Linhas por lote buscado no cursor do servidor; a memória fica limitada a um lote
+EXPORT_BATCH_SIZE = 1000
+
+
+def _csv_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, enum.Enum):
+        return value.value
+    return value
+
+
+async def _stream_rows(stmt, formato: str):
+    # Sessão própria: a da dependência get_db é fechada antes do fim do streaming
+    async with AsyncSessionLocal() as db:
+        result = await db.stream(stmt.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        keys = list(result.keys())
+        if formato == "csv":
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(keys)
+            yield buffer.getvalue().encode()
+
+        async for batch in result.partitions():
+            if formato == "csv":
+                buffer.seek(0)
+                buffer.truncate()
+                writer.writerows([_csv_value(v) for v in row] for row in batch)
+                yield buffer.getvalue().encode()
+            else:
+                yield b"".join(dump_json(dict(zip(keys, row))) + b"\n" for row in batch)
+
+
+def _export_response(stmt, formato: str, filename: str) -> StreamingResponse:
+    media_type, extension = EXPORT_FORMATS[formato]
+    return StreamingResponse(
+        _stream_rows(stmt, formato),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{extension}"'},
+    )
+
+
+def _check_format(formato: str) -> None:
+    if formato not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"formato deve ser um de: {', '.join(EXPORT_FORMATS)}")
+
+
+@router.get("/maintenance")
+async def export_maintenance(
+    formato: str = Query("ndjson"),
+    data_inicio: Optional[datetime] = None,
+    data_fim: Optional[datetime] = None,
+    machine_id: Optional[int] = None,
+    user: Principal = Depends(get_current_user),
+):
+    _check_format(formato)
+    # Histórico completo de todas as máquinas do usuário, na ordem do índice (machine_id, data, id)
+    stmt = (
+        select(
+            Maintenance.id,
+            Maintenance.machine_id,
+            Machine.nome.label("maquina"),
+            Machine.tipo,
+            Maintenance.descricao,
+            Maintenance.horimetro_no_momento,
+            Maintenance.data,
+            Maintenance.custo,
+            Maintenance.observacao,
+        )
+        .join(Machine, Machine.id == Maintenance.machine_id)
+        .where(Machine.user_id == user.id)
+        .order_by(Maintenance.machine_id, Maintenance.data, Maintenance.id)
+    )
+    if data_inicio is not None:
+        stmt = stmt.where(Maintenance.data >= data_inicio)
+    if data_fim is not None:
+        stmt = stmt.where(Maintenance.data <= data_fim)
+    if machine_id is not None:
+        stmt = stmt.where(Maintenance.machine_id == machine_id)
+    return _export_response(stmt, formato, "manutencoes")
+
+
+@router.get("/movements")
+async def export_movements(
+    formato: str = Query("ndjson"),
+    data_inicio: Optional[datetime] = None,
+    data_fim: Optional[datetime] = None,
+    supply_id: Optional[int] = None,
+    user: Principal = Depends(get_current_user),
+):
+    _check_format(formato)
+    stmt = (
+        select(
+            Movement.id,
+            Movement.supply_id,
+            Supply.nome.label("insumo"),
+            Supply.unidade,
+            Movement.tipo,
+            Movement.quantidade,
+            Movement.data,
+            Movement.observacao,
+        )
+        .join(Supply, Supply.id == Movement.supply_id)
+        .where(Supply.user_id == user.id)
+        .order_by(Movement.supply_id, Movement.data, Movement.id)
+    )
+    if data_inicio is not None:
+        stmt = stmt.where(Movement.data >= data_inicio)
+    if data_fim is not None:
+        stmt = stmt.where(Movement.data <= data_fim)
+    if supply_id is not None:
+        stmt = stmt.where(Movement.supply_id == supply_id)
+    return _export_response(stmt, formato, "movimentacoes")
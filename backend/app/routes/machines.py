@@ -1,24 +1,61 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+from datetime import datetime, timedelta, timezone
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 
 from app.database import get_db
-from app.models import Machine, User
-from app.schemas import MachineCreate, MachineUpdate, MachineOut
-from app.auth import get_current_user
+from app.models import Machine, MachineForecast, Maintenance, MACHINE_OUT_COLUMNS, MACHINE_STATUSES
+from app.schemas import MachineCreate, MachineDueOut, MachineUpdate, MachineOut
+from app.auth import Principal, get_current_user
+from app.forecasting import record_machine_usage
+from app.response_cache import cached_list
+from app.responses import json_response, rows_as_dicts
+from app.versioning import MACHINES, MAINTENANCE, bump_versions, conditional_get, next_change_id
 
 router = APIRouter(tags=["Máquinas"])
 
 
-@router.get("", response_model=List[MachineOut])
-def list_machines(db: Session = Depends(get_db), user: User = Depends(get_current_user)):
-    return db.query(Machine).filter(Machine.user_id == user.id).all()
+@router.get("", response_model=List[MachineOut], dependencies=[Depends(conditional_get(MACHINES))])
+async def list_machines(
+    request: Request,
+    response: Response,
+    status_filter: Optional[str] = Query(None, alias="status"),
+    db: AsyncSession = Depends(get_db),
+    user: Principal = Depends(get_current_user),
+):
+    stmt = select(*MACHINE_OUT_COLUMNS).where(Machine.user_id == user.id)
+    if status_filter is not None:
+        if status_filter not in MACHINE_STATUSES:
+            raise HTTPException(status_code=400, detail="Status inválido")
+        stmt = stmt.where(Machine.status == status_filter)
+    return await cached_list(request, response, user.id, MACHINES, db, stmt, {"status": status_filter})
+
+
+@router.get("/due", response_model=List[MachineDueOut])
+async def machines_due(
+    response: Response,
+    dias: int = Query(30, ge=0, le=3650),
+    db: AsyncSession = Depends(get_db),
+    user: Principal = Depends(get_current_user),
+):
+    # Máquinas cuja data prevista de manutenção cai nos próximos `dias` (ou já passou);
+    # lê a data materializada pelo índice (user_id, data_prevista)
+    limite = datetime.now(timezone.utc) + timedelta(days=dias)
+    stmt = (
+        select(*MACHINE_OUT_COLUMNS, MachineForecast.horas_por_dia, MachineForecast.data_prevista)
+        .join(MachineForecast, MachineForecast.machine_id == Machine.id)
+        .where(MachineForecast.user_id == user.id, MachineForecast.data_prevista <= limite)
+        .order_by(MachineForecast.data_prevista)
+    )
+    return json_response(rows_as_dicts(await db.execute(stmt)), response)
 
 
 @router.post("", response_model=MachineOut, status_code=status.HTTP_201_CREATED)
-def create_machine(data: MachineCreate, db: Session = Depends(get_db), user: User = Depends(get_current_user)):
+async def create_machine(data: MachineCreate, db: AsyncSession = Depends(get_db), user: Principal = Depends(get_current_user)):
     machine = Machine(
         user_id=user.id,
+        change_id=await next_change_id(db, user.id),
         nome=data.nome,
         tipo=data.tipo,
         horimetro_atual=data.horimetro_atual,
@@ -26,22 +63,28 @@ def create_machine(data: MachineCreate, db: Session = Depends(get_db), user: Use
         proxima_manutencao=data.horimetro_atual + data.intervalo_manutencao,
     )
     db.add(machine)
-    db.commit()
-    db.refresh(machine)
+    await db.flush()
+    # O cadastro é a primeira leitura do horímetro
+    await record_machine_usage(db, user.id, [machine], [(machine.id, datetime.now(timezone.utc), machine.horimetro_atual)])
+    await bump_versions(db, user.id, MACHINES)
+    await db.commit()
+    await db.refresh(machine)
     return machine
 
 
 @router.put("/{machine_id}", response_model=MachineOut)
-def update_machine(
+async def update_machine(
     machine_id: int,
     data: MachineUpdate,
-    db: Session = Depends(get_db),
-    user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+    user: Principal = Depends(get_current_user),
 ):
-    machine = db.query(Machine).filter(Machine.id == machine_id, Machine.user_id == user.id).first()
+    change_id = await next_change_id(db, user.id)
+    machine = await db.scalar(select(Machine).where(Machine.id == machine_id, Machine.user_id == user.id))
     if not machine:
         raise HTTPException(status_code=404, detail="Máquina não encontrada")
 
+    machine.change_id = change_id
     if data.nome is not None:
         machine.nome = data.nome
     if data.tipo is not None:
@@ -53,19 +96,37 @@ def update_machine(
         # Recalcular próxima manutenção quando horímetro é atualizado
         machine.proxima_manutencao = machine.horimetro_atual + machine.intervalo_manutencao
 
-    db.commit()
-    db.refresh(machine)
+    # Nova leitura do horímetro: entra no ritmo de uso e move a data prevista
+    if data.horimetro_atual is not None:
+        await record_machine_usage(db, user.id, [machine], [(machine.id, datetime.now(timezone.utc), machine.horimetro_atual)])
+    await bump_versions(db, user.id, MACHINES)
+    await db.commit()
+    await db.refresh(machine)
     return machine
 
 
 @router.delete("/{machine_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_machine(
+async def delete_machine(
     machine_id: int,
-    db: Session = Depends(get_db),
-    user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+    user: Principal = Depends(get_current_user),
 ):
-    machine = db.query(Machine).filter(Machine.id == machine_id, Machine.user_id == user.id).first()
-    if not machine:
+    # Exclusão lógica: máquina e histórico viram lápides com o mesmo change_id,
+    # e o /api/sync avisa os tablets. Agregados e previsão ficam, escondidos pelo JOIN
+    change_id = await next_change_id(db, user.id)
+    agora = datetime.now(timezone.utc)
+    deleted = (await db.execute(
+        update(Machine)
+        .where(Machine.id == machine_id, Machine.user_id == user.id)
+        .values(deleted_at=agora, change_id=change_id)
+        .returning(Machine.id)
+    )).scalar_one_or_none()
+    if deleted is None:
         raise HTTPException(status_code=404, detail="Máquina não encontrada")
-    db.delete(machine)
-    db.commit()
+    await db.execute(
+        update(Maintenance)
+        .where(Maintenance.machine_id == machine_id)
+        .values(deleted_at=agora, change_id=change_id)
+    )
+    await bump_versions(db, user.id, MACHINES, MAINTENANCE)
+    await db.commit()
@@ -1,27 +1,35 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 
 from app.database import get_db
-from app.models import Maintenance, Machine, User
-from app.schemas import MaintenanceCreate, MaintenanceOut
-from app.auth import get_current_user
+from app.models import Maintenance, Machine, MAINTENANCE_OUT_COLUMNS
+from app.schemas import MAX_BULK_ITEMS, BulkResult, MaintenanceCreate, MaintenanceOut
+from app.auth import Principal, get_current_user
+from app.outbox import MAINTENANCE_CREATED, enqueue
+from app.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, paginate_history
+from app.responses import json_response
+from app.versioning import MACHINES, MAINTENANCE, bump_versions, conditional_get, next_change_id
 
 router = APIRouter(tags=["Manutenção"])
 
 
 @router.post("", response_model=MaintenanceOut, status_code=status.HTTP_201_CREATED)
-def create_maintenance(
+async def create_maintenance(
     data: MaintenanceCreate,
-    db: Session = Depends(get_db),
-    user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+    user: Principal = Depends(get_current_user),
 ):
-    machine = db.query(Machine).filter(Machine.id == data.machine_id, Machine.user_id == user.id).first()
+    change_id = await next_change_id(db, user.id)
+    machine = await db.scalar(select(Machine).where(Machine.id == data.machine_id, Machine.user_id == user.id))
     if not machine:
         raise HTTPException(status_code=404, detail="Máquina não encontrada")
 
     maintenance = Maintenance(
         machine_id=data.machine_id,
+        change_id=change_id,
         descricao=data.descricao,
         horimetro_no_momento=data.horimetro_no_momento,
         custo=data.custo,
@@ -32,25 +40,88 @@ def create_maintenance(
     # Atualizar horímetro da máquina e recalcular próxima manutenção
     machine.horimetro_atual = data.horimetro_no_momento
     machine.proxima_manutencao = data.horimetro_no_momento + machine.intervalo_manutencao
+    machine.change_id = change_id
 
-    db.commit()
-    db.refresh(maintenance)
+    await db.flush()
+    # Agregado de custos e ritmo de uso ficam com o worker do outbox
+    enqueue(db, user.id, MAINTENANCE_CREATED, {"ids": [maintenance.id]})
+    await bump_versions(db, user.id, MAINTENANCE, MACHINES)
+    await db.commit()
+    await db.refresh(maintenance)
     return maintenance
 
 
-@router.get("/{machine_id}", response_model=List[MaintenanceOut])
-def list_maintenance(
+@router.post("/bulk", response_model=BulkResult)
+async def create_maintenance_bulk(
+    data: List[MaintenanceCreate],
+    db: AsyncSession = Depends(get_db),
+    user: Principal = Depends(get_current_user),
+):
+    if len(data) > MAX_BULK_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Máximo de {MAX_BULK_ITEMS} registros por lote")
+
+    change_id = await next_change_id(db, user.id)
+    # Uma única consulta de posse para todas as máquinas do lote
+    machine_ids = {item.machine_id for item in data}
+    machines = {
+        machine.id: machine
+        for machine in await db.scalars(
+            select(Machine).where(Machine.id.in_(machine_ids), Machine.user_id == user.id)
+        )
+    }
+
+    rows = []
+    erros = []
+    for indice, item in enumerate(data):
+        machine = machines.get(item.machine_id)
+        if machine is None:
+            erros.append({"indice": indice, "detail": "Máquina não encontrada"})
+            continue
+        rows.append({
+            "machine_id": item.machine_id,
+            "descricao": item.descricao,
+            "horimetro_no_momento": item.horimetro_no_momento,
+            "custo": item.custo,
+            "observacao": item.observacao,
+            "change_id": change_id,
+        })
+        # Mesma regra do registro unitário, aplicada na ordem do lote
+        machine.horimetro_atual = item.horimetro_no_momento
+        machine.proxima_manutencao = item.horimetro_no_momento + machine.intervalo_manutencao
+        machine.change_id = change_id
+
+    if rows:
+        inserted = await db.scalars(insert(Maintenance).returning(Maintenance.id), rows)
+        enqueue(db, user.id, MAINTENANCE_CREATED, {"ids": inserted.all()})
+        await bump_versions(db, user.id, MAINTENANCE, MACHINES)
+    await db.commit()
+    return {"criados": len(rows), "erros": erros}
+
+
+@router.get("/{machine_id}", response_model=List[MaintenanceOut], dependencies=[Depends(conditional_get(MAINTENANCE))])
+async def list_maintenance(
     machine_id: int,
-    db: Session = Depends(get_db),
-    user: User = Depends(get_current_user),
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    data_inicio: Optional[datetime] = None,
+    data_fim: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_db),
+    user: Principal = Depends(get_current_user),
 ):
-    machine = db.query(Machine).filter(Machine.id == machine_id, Machine.user_id == user.id).first()
+    machine = await db.scalar(select(Machine.id).where(Machine.id == machine_id, Machine.user_id == user.id))
     if not machine:
         raise HTTPException(status_code=404, detail="Máquina não encontrada")
 
-    return (
-        db.query(Maintenance)
-        .filter(Maintenance.machine_id == machine_id)
-        .order_by(Maintenance.data.desc())
-        .all()
+    rows = await paginate_history(
+        db,
+        select(*MAINTENANCE_OUT_COLUMNS).where(Maintenance.machine_id == machine_id),
+        Maintenance.data,
+        Maintenance.id,
+        response,
+        limit=limit,
+        cursor=cursor,
+        data_inicio=data_inicio,
+        data_fim=data_fim,
     )
+    return json_response(rows, response)
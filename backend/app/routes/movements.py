@@ -1,62 +1,141 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy import insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 
 from app.database import get_db
-from app.models import Movement, Supply, User, MovementType
-from app.schemas import MovementCreate, MovementOut
-from app.auth import get_current_user
+from app.models import Movement, Supply, MovementType, MOVEMENT_OUT_COLUMNS
+from app.schemas import MAX_BULK_ITEMS, BulkResult, MovementCreate, MovementOut
+from app.auth import Principal, get_current_user
+from app.outbox import MOVEMENT_CREATED, enqueue
+from app.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, paginate_history
+from app.responses import json_response
+from app.versioning import MOVEMENTS, SUPPLIES, bump_versions, conditional_get, next_change_id
 
 router = APIRouter(tags=["Movimentação"])
 
 
 @router.post("", response_model=MovementOut, status_code=status.HTTP_201_CREATED)
-def create_movement(
+async def create_movement(
     data: MovementCreate,
-    db: Session = Depends(get_db),
-    user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+    user: Principal = Depends(get_current_user),
 ):
-    supply = db.query(Supply).filter(Supply.id == data.supply_id, Supply.user_id == user.id).first()
-    if not supply:
-        raise HTTPException(status_code=404, detail="Insumo não encontrado")
-
-    if data.tipo not in ("entrada", "saida"):
-        raise HTTPException(status_code=400, detail="Tipo deve ser 'entrada' ou 'saida'")
+    change_id = await next_change_id(db, user.id)
+    # Atualizar quantidade do insumo num único UPDATE condicional: a verificação
+    # de saldo e a escrita são atômicas, sem perder atualizações concorrentes
+    stmt = update(Supply).where(Supply.id == data.supply_id, Supply.user_id == user.id)
+    if data.tipo == "entrada":
+        stmt = stmt.values(quantidade_atual=Supply.quantidade_atual + data.quantidade, change_id=change_id)
+    else:
+        stmt = stmt.where(Supply.quantidade_atual >= data.quantidade).values(
+            quantidade_atual=Supply.quantidade_atual - data.quantidade, change_id=change_id
+        )
+    updated = (await db.execute(stmt.returning(Supply.id))).scalar_one_or_none()
+    if updated is None:
+        await db.rollback()
+        exists = await db.scalar(select(Supply.id).where(Supply.id == data.supply_id, Supply.user_id == user.id))
+        if not exists:
+            raise HTTPException(status_code=404, detail="Insumo não encontrado")
+        raise HTTPException(status_code=400, detail="Quantidade insuficiente em estoque")
 
     movement = Movement(
         supply_id=data.supply_id,
+        change_id=change_id,
         tipo=MovementType(data.tipo),
         quantidade=data.quantidade,
         observacao=data.observacao,
     )
     db.add(movement)
+    await db.flush()
+    # Previsão de consumo fica com o worker do outbox
+    enqueue(db, user.id, MOVEMENT_CREATED, {"ids": [movement.id]})
+    await bump_versions(db, user.id, MOVEMENTS, SUPPLIES)
 
-    # Atualizar quantidade do insumo
-    if data.tipo == "entrada":
-        supply.quantidade_atual += data.quantidade
-    else:
-        if supply.quantidade_atual < data.quantidade:
-            raise HTTPException(status_code=400, detail="Quantidade insuficiente em estoque")
-        supply.quantidade_atual -= data.quantidade
-
-    db.commit()
-    db.refresh(movement)
+    await db.commit()
+    await db.refresh(movement)
     return movement
 
 
-@router.get("/{supply_id}", response_model=List[MovementOut])
-def list_movements(
+@router.post("/bulk", response_model=BulkResult)
+async def create_movement_bulk(
+    data: List[MovementCreate],
+    db: AsyncSession = Depends(get_db),
+    user: Principal = Depends(get_current_user),
+):
+    if len(data) > MAX_BULK_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Máximo de {MAX_BULK_ITEMS} registros por lote")
+
+    change_id = await next_change_id(db, user.id)
+    # Uma única consulta de posse; as linhas ficam travadas até o commit do lote
+    supply_ids = {item.supply_id for item in data}
+    supplies = {
+        supply.id: supply
+        for supply in await db.scalars(
+            select(Supply)
+            .where(Supply.id.in_(supply_ids), Supply.user_id == user.id)
+            .with_for_update()
+        )
+    }
+
+    rows = []
+    erros = []
+    for indice, item in enumerate(data):
+        supply = supplies.get(item.supply_id)
+        if supply is None:
+            erros.append({"indice": indice, "detail": "Insumo não encontrado"})
+            continue
+        # Saldo aplicado na ordem do lote; uma saída sem saldo não afeta as demais
+        if item.tipo == "entrada":
+            supply.quantidade_atual += item.quantidade
+        else:
+            if supply.quantidade_atual < item.quantidade:
+                erros.append({"indice": indice, "detail": "Quantidade insuficiente em estoque"})
+                continue
+            supply.quantidade_atual -= item.quantidade
+        supply.change_id = change_id
+
+        rows.append({
+            "supply_id": item.supply_id,
+            "tipo": MovementType(item.tipo),
+            "quantidade": item.quantidade,
+            "observacao": item.observacao,
+            "change_id": change_id,
+        })
+
+    if rows:
+        inserted = await db.scalars(insert(Movement).returning(Movement.id), rows)
+        enqueue(db, user.id, MOVEMENT_CREATED, {"ids": inserted.all()})
+        await bump_versions(db, user.id, MOVEMENTS, SUPPLIES)
+    await db.commit()
+    return {"criados": len(rows), "erros": erros}
+
+
+@router.get("/{supply_id}", response_model=List[MovementOut], dependencies=[Depends(conditional_get(MOVEMENTS))])
+async def list_movements(
     supply_id: int,
-    db: Session = Depends(get_db),
-    user: User = Depends(get_current_user),
+    response: Response,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    data_inicio: Optional[datetime] = None,
+    data_fim: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_db),
+    user: Principal = Depends(get_current_user),
 ):
-    supply = db.query(Supply).filter(Supply.id == supply_id, Supply.user_id == user.id).first()
+    supply = await db.scalar(select(Supply.id).where(Supply.id == supply_id, Supply.user_id == user.id))
     if not supply:
         raise HTTPException(status_code=404, detail="Insumo não encontrado")
 
-    return (
-        db.query(Movement)
-        .filter(Movement.supply_id == supply_id)
-        .order_by(Movement.data.desc())
-        .all()
+    rows = await paginate_history(
+        db,
+        select(*MOVEMENT_OUT_COLUMNS).where(Movement.supply_id == supply_id),
+        Movement.data,
+        Movement.id,
+        response,
+        limit=limit,
+        cursor=cursor,
+        data_inicio=data_inicio,
+        data_fim=data_fim,
     )
+    return json_response(rows, response)
@@ -0,0 +1,34 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+
+from app.database import get_db
+from app.schemas import SearchResultOut
+from app.auth import Principal, get_current_user
+from app.pagination import NEXT_CURSOR_HEADER
+from app.responses import json_response
+from app.search import RESOURCES, search
+
+router = APIRouter(tags=["Busca"])
+
+
+@router.get("", response_model=List[SearchResultOut])
+async def search_resources(
+    response: Response,
+    q: str = Query(..., min_length=2, max_length=100),
+    recurso: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+    user: Principal = Depends(get_current_user),
+):
+    # Máquinas (nome e tipo) e insumos (nome e unidade), sem diferenciar acentos
+    # nem maiúsculas e tolerando erros de digitação, do mais relevante ao menos
+    if recurso is not None and recurso not in RESOURCES:
+        raise HTTPException(status_code=400, detail="Recurso inválido")
+    rows, next_cursor = await search(
+        db, user.id, q, (recurso,) if recurso else RESOURCES, limit=limit, cursor=cursor
+    )
+    if next_cursor:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    return json_response(rows, response)
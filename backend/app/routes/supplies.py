@@ -1,46 +1,76 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 
 from app.database import get_db
-from app.models import Supply, User
-from app.schemas import SupplyCreate, SupplyUpdate, SupplyOut
-from app.auth import get_current_user
+from app.models import Supply, SUPPLY_OUT_COLUMNS, SUPPLY_STATUSES
+from app.schemas import SupplyCreate, SupplyForecastOut, SupplyUpdate, SupplyOut
+from app.auth import Principal, get_current_user
+from app.forecasting import supply_forecasts
+from app.response_cache import cached_list
+from app.responses import json_response
+from app.versioning import SUPPLIES, bump_versions, conditional_get, next_change_id
 
 router = APIRouter(tags=["Estoque"])
 
 
-@router.get("", response_model=List[SupplyOut])
-def list_supplies(db: Session = Depends(get_db), user: User = Depends(get_current_user)):
-    return db.query(Supply).filter(Supply.user_id == user.id).all()
+@router.get("", response_model=List[SupplyOut], dependencies=[Depends(conditional_get(SUPPLIES))])
+async def list_supplies(
+    request: Request,
+    response: Response,
+    status_filter: Optional[str] = Query(None, alias="status"),
+    db: AsyncSession = Depends(get_db),
+    user: Principal = Depends(get_current_user),
+):
+    stmt = select(*SUPPLY_OUT_COLUMNS).where(Supply.user_id == user.id)
+    if status_filter is not None:
+        if status_filter not in SUPPLY_STATUSES:
+            raise HTTPException(status_code=400, detail="Status inválido")
+        stmt = stmt.where(Supply.status == status_filter)
+    return await cached_list(request, response, user.id, SUPPLIES, db, stmt, {"status": status_filter})
+
+
+@router.get("/forecast", response_model=List[SupplyForecastOut])
+async def forecast_supplies(
+    response: Response,
+    db: AsyncSession = Depends(get_db),
+    user: Principal = Depends(get_current_user),
+):
+    # Consumo diário suavizado e dias até o mínimo/ruptura de cada insumo do usuário
+    return json_response(await supply_forecasts(db, user.id), response)
 
 
 @router.post("", response_model=SupplyOut, status_code=status.HTTP_201_CREATED)
-def create_supply(data: SupplyCreate, db: Session = Depends(get_db), user: User = Depends(get_current_user)):
+async def create_supply(data: SupplyCreate, db: AsyncSession = Depends(get_db), user: Principal = Depends(get_current_user)):
     supply = Supply(
         user_id=user.id,
+        change_id=await next_change_id(db, user.id),
         nome=data.nome,
         unidade=data.unidade,
         quantidade_atual=data.quantidade_atual,
         quantidade_minima=data.quantidade_minima,
     )
     db.add(supply)
-    db.commit()
-    db.refresh(supply)
+    await bump_versions(db, user.id, SUPPLIES)
+    await db.commit()
+    await db.refresh(supply)
     return supply
 
 
 @router.put("/{supply_id}", response_model=SupplyOut)
-def update_supply(
+async def update_supply(
     supply_id: int,
     data: SupplyUpdate,
-    db: Session = Depends(get_db),
-    user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+    user: Principal = Depends(get_current_user),
 ):
-    supply = db.query(Supply).filter(Supply.id == supply_id, Supply.user_id == user.id).first()
+    change_id = await next_change_id(db, user.id)
+    supply = await db.scalar(select(Supply).where(Supply.id == supply_id, Supply.user_id == user.id))
     if not supply:
         raise HTTPException(status_code=404, detail="Insumo não encontrado")
 
+    supply.change_id = change_id
     if data.nome is not None:
         supply.nome = data.nome
     if data.unidade is not None:
@@ -48,6 +78,7 @@ def update_supply(
     if data.quantidade_minima is not None:
         supply.quantidade_minima = data.quantidade_minima
 
-    db.commit()
-    db.refresh(supply)
+    await bump_versions(db, user.id, SUPPLIES)
+    await db.commit()
+    await db.refresh(supply)
     return supply
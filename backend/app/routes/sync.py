@@ -0,0 +1,59 @@
+from fastapi import APIRouter, Depends, Query, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+
+from app.database import get_db
+from app.models import (
+    MACHINE_OUT_COLUMNS, MAINTENANCE_OUT_COLUMNS, MOVEMENT_OUT_COLUMNS, SUPPLY_OUT_COLUMNS,
+    Machine, Maintenance, Movement, Supply, User,
+)
+from app.schemas import SyncOut
+from app.auth import Principal, get_current_user
+from app.responses import json_response, rows_as_dicts
+
+router = APIRouter(tags=["Sincronização"])
+
+
+async def _changes(db: AsyncSession, model, columns, owner, user_id: int, since: Optional[int], token: int):
+    stmt = select(*columns, model.updated_at, model.deleted_at)
+    if owner is not model:
+        stmt = stmt.join(owner)
+    stmt = stmt.where(owner.user_id == user_id)
+    if since is None:
+        # Primeira sincronização: retrato atual, sem lápides
+        return rows_as_dicts(await db.execute(stmt.order_by(model.id)))
+    # Índice (dono, change_id): só as linhas alteradas, lápides incluídas
+    stmt = stmt.where(model.change_id > since, model.change_id <= token).order_by(model.change_id, model.id)
+    return rows_as_dicts(await db.execute(stmt.execution_options(include_deleted=True)))
+
+
+@router.get("", response_model=SyncOut)
+async def sync_changes(
+    response: Response,
+    since: Optional[int] = Query(None, ge=0),
+    db: AsyncSession = Depends(get_db),
+    user: Principal = Depends(get_current_user),
+):
+    # O token é lido antes das linhas e limita a faixa: como o change_id segue a
+    # ordem dos commits, tudo até ele já está visível e nada depois dele é enviado
+    token = await db.scalar(select(User.change_seq).where(User.id == user.id))
+    if since is not None and since > token:
+        # Token de outro banco (restauração, ambiente trocado): recomeça do retrato
+        since = None
+    if since == token:
+        return json_response(
+            {"token": token, "completo": False, "maquinas": [], "manutencoes": [], "insumos": [], "movimentacoes": []},
+            response,
+        )
+    return json_response(
+        {
+            "token": token,
+            "completo": since is None,
+            "maquinas": await _changes(db, Machine, MACHINE_OUT_COLUMNS, Machine, user.id, since, token),
+            "manutencoes": await _changes(db, Maintenance, MAINTENANCE_OUT_COLUMNS, Machine, user.id, since, token),
+            "insumos": await _changes(db, Supply, SUPPLY_OUT_COLUMNS, Supply, user.id, since, token),
+            "movimentacoes": await _changes(db, Movement, MOVEMENT_OUT_COLUMNS, Supply, user.id, since, token),
+        },
+        response,
+    )
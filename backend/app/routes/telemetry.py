@@ -0,0 +1,26 @@
+from datetime import datetime, timezone
+from fastapi import APIRouter, Depends, HTTPException, status
+from typing import List
+
+from app.auth import Principal, get_current_user
+from app.forecasting import as_utc
+from app.schemas import MAX_BULK_ITEMS, TelemetryReading, TelemetryResult
+from app.telemetry import telemetry
+
+router = APIRouter(tags=["Telemetria"])
+
+
+@router.post("", response_model=TelemetryResult, status_code=status.HTTP_202_ACCEPTED)
+async def ingest_readings(data: List[TelemetryReading], user: Principal = Depends(get_current_user)):
+    # Só acumula em memória; o horímetro vai para o banco no próximo flush (app/telemetry.py).
+    # Leitura menor ou igual à pendente da mesma máquina é descartada
+    if len(data) > MAX_BULK_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Máximo de {MAX_BULK_ITEMS} leituras por lote")
+
+    agora = datetime.now(timezone.utc)
+    aceitas = 0
+    for leitura in data:
+        # Relógio adiantado do gateway não cria leitura no futuro
+        momento = min(as_utc(leitura.data), agora) if leitura.data else agora
+        aceitas += telemetry.offer(user.id, leitura.machine_id, leitura.horimetro, momento)
+    return {"aceitas": aceitas, "descartadas": len(data) - aceitas}
@@ -1,6 +1,6 @@
-from datetime import datetime
-from typing import Optional
-from pydantic import BaseModel, EmailStr
+from datetime import date, datetime
+from typing import List, Literal, Optional
+from pydantic import BaseModel, EmailStr, Field
 
 
 # ── Auth ─────────────────────────────────────────────────
@@ -15,6 +15,11 @@ class UserLogin(BaseModel):
     password: str
 
 
+class PasswordChange(BaseModel):
+    current_password: str
+    new_password: str
+
+
 class UserOut(BaseModel):
     id: int
     name: str
@@ -59,6 +64,11 @@ class MachineOut(BaseModel):
         from_attributes = True
 
 
+class MachineDueOut(MachineOut):
+    horas_por_dia: Optional[float] = None
+    data_prevista: datetime
+
+
 # ── Manutenção ───────────────────────────────────────────
 class MaintenanceCreate(BaseModel):
     machine_id: int
@@ -81,6 +91,32 @@ class MaintenanceOut(BaseModel):
         from_attributes = True
 
 
+class CostReportRow(BaseModel):
+    machine_id: Optional[int] = None
+    nome: Optional[str] = None
+    tipo: Optional[str] = None
+    mes: Optional[date] = None
+    quantidade: int
+    custo_total: float
+    custo_medio: float
+    ultimo_horimetro: float
+    ultima_data: datetime
+
+
+# ── Lotes ────────────────────────────────────────────────
+MAX_BULK_ITEMS = 1000
+
+
+class BulkItemError(BaseModel):
+    indice: int
+    detail: str
+
+
+class BulkResult(BaseModel):
+    criados: int
+    erros: List[BulkItemError]
+
+
 # ── Estoque ──────────────────────────────────────────────
 class SupplyCreate(BaseModel):
     nome: str
@@ -111,11 +147,26 @@ class SupplyOut(BaseModel):
 # ── Movimentação ─────────────────────────────────────────
 class MovementCreate(BaseModel):
     supply_id: int
-    tipo: str  # "entrada" | "saida"
-    quantidade: float
+    tipo: Literal["entrada", "saida"]
+    # Positiva: uma saída negativa aumentaria o estoque
+    quantidade: float = Field(gt=0)
     observacao: str = ""
 
 
+class SupplyForecastOut(BaseModel):
+    id: int
+    nome: str
+    unidade: str
+    quantidade_atual: float
+    quantidade_minima: float
+    status: str
+    created_at: datetime
+    consumo_diario: float  # unidades/dia, suavizado
+    dias_ate_minimo: Optional[float] = None
+    dias_ate_ruptura: Optional[float] = None
+    data_ruptura: Optional[datetime] = None
+
+
 class MovementOut(BaseModel):
     id: int
     supply_id: int
@@ -126,3 +177,98 @@ class MovementOut(BaseModel):
 
     class Config:
         from_attributes = True
+
+
+# ── Dashboard ────────────────────────────────────────────
+class MachineStatusCount(BaseModel):
+    total: int
+    ok: int
+    proximo: int
+    atencao: int
+
+
+class SupplyStatusCount(BaseModel):
+    total: int
+    ok: int
+    estoque_baixo: int
+
+
+class MachineAlert(BaseModel):
+    id: int
+    nome: str
+    tipo: str
+    horimetro_atual: float
+    proxima_manutencao: float
+    status: str
+
+
+class SupplyAlert(BaseModel):
+    id: int
+    nome: str
+    unidade: str
+    quantidade_atual: float
+    quantidade_minima: float
+    status: str
+
+
+class DashboardOut(BaseModel):
+    maquinas: MachineStatusCount
+    insumos: SupplyStatusCount
+    manutencoes_recentes: int
+    custo_manutencao_recente: float
+    dias: int
+    maquinas_alerta: List[MachineAlert]
+    insumos_alerta: List[SupplyAlert]
+
+
+# ── Sincronização ────────────────────────────────────────
+# Linhas com deleted_at preenchido são lápides: o tablet remove o registro local
+class MachineSyncOut(MachineOut):
+    updated_at: Optional[datetime] = None
+    deleted_at: Optional[datetime] = None
+
+
+class MaintenanceSyncOut(MaintenanceOut):
+    updated_at: Optional[datetime] = None
+    deleted_at: Optional[datetime] = None
+
+
+class SupplySyncOut(SupplyOut):
+    updated_at: Optional[datetime] = None
+    deleted_at: Optional[datetime] = None
+
+
+class MovementSyncOut(MovementOut):
+    updated_at: Optional[datetime] = None
+    deleted_at: Optional[datetime] = None
+
+
+class SyncOut(BaseModel):
+    token: int
+    completo: bool
+    maquinas: List[MachineSyncOut]
+    manutencoes: List[MaintenanceSyncOut]
+    insumos: List[SupplySyncOut]
+    movimentacoes: List[MovementSyncOut]
+
+
+# ── Telemetria ───────────────────────────────────────────
+class TelemetryReading(BaseModel):
+    machine_id: int
+    horimetro: float
+    data: Optional[datetime] = None  # momento da leitura; padrão: recebimento
+
+
+class TelemetryResult(BaseModel):
+    aceitas: int
+    descartadas: int
+
+
+# ── Busca ────────────────────────────────────────────────
+class SearchResultOut(BaseModel):
+    recurso: str  # "maquina" | "insumo"
+    id: int
+    nome: str
+    detalhe: str  # tipo da máquina ou unidade do insumo
+    status: str
+    relevancia: float
@@ -0,0 +1,214 @@
+import base64
+import re
+import unicodedata
+from typing import Optional
+
+from fastapi import HTTPException
+from sqlalchemy import Float, Numeric, cast, func, literal, literal_column, select, text, tuple_, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.cache import TTLCache
+from app.config import settings
+from app.models import Machine, Supply
+from app.responses import rows_as_dicts
+from app.versioning import MACHINES, SUPPLIES, get_versions
+
+RESOURCES = ("maquina", "insumo")
+# Limiar de word_similarity para entrar no resultado (o padrão do pg_trgm)
+WORD_SIMILARITY_THRESHOLD = 0.6
+# Relevância arredondada: o cursor compara igualdade sem ruído de ponto flutuante
+SCORE_DIGITS = 4
+
+# Mesmas expressões dos índices GIN da migração 0006: o planejador só usa o
+# índice se a expressão da consulta for idêntica à indexada
+MACHINE_TEXT = literal_column("lower(f_unaccent(machines.nome || ' ' || machines.tipo))")
+SUPPLY_TEXT = literal_column("lower(f_unaccent(supplies.nome || ' ' || supplies.unidade))")
+
+
+# ── Cursor (relevância, recurso, id) ─────────────────────
+def encode_cursor(relevancia: float, recurso: str, row_id: int) -> str:
+    raw = f"{relevancia!r}|{recurso}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[float, str, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        relevancia, recurso, row_id = base64.urlsafe_b64decode(padded).decode().split("|")
+        return float(relevancia), recurso, int(row_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+
+# ── Postgres: pg_trgm + unaccent ─────────────────────────
+_trigram_support: dict[str, bool] = {}
+
+
+async def trigram_available(db: AsyncSession) -> bool:
+    # Sondado uma vez por banco: a migração 0006 só cria a função e os índices se
+    # o servidor tiver as extensões
+    if db.bind.dialect.name != "postgresql":
+        return False
+    key = str(db.bind.url)
+    if key not in _trigram_support:
+        _trigram_support[key] = bool(await db.scalar(text(
+            "SELECT to_regprocedure('f_unaccent(text)') IS NOT NULL "
+            "AND EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm')"
+        )))
+    return _trigram_support[key]
+
+
+def _ranked(model, recurso: str, detalhe, document, user_id: int, query):
+    relevancia = cast(func.round(cast(func.word_similarity(query, document), Numeric), SCORE_DIGITS), Float)
+    return (
+        select(
+            literal(recurso).label("recurso"),
+            model.id.label("id"),
+            model.nome.label("nome"),
+            detalhe.label("detalhe"),
+            model.status.label("status"),
+            relevancia.label("relevancia"),
+        )
+        # documento %> consulta equivale a word_similarity(consulta, documento)
+        # acima do limiar, com o documento à esquerda para o índice GIN atender
+        .where(model.user_id == user_id, model.deleted_at.is_(None), document.op("%>")(query))
+    )
+
+
+async def _search_postgres(db: AsyncSession, user_id: int, q: str, recursos, limit: int, after) -> list[dict]:
+    query = func.lower(func.f_unaccent(q))
+    parts = []
+    if "maquina" in recursos:
+        parts.append(_ranked(Machine, "maquina", Machine.tipo, MACHINE_TEXT, user_id, query))
+    if "insumo" in recursos:
+        parts.append(_ranked(Supply, "insumo", Supply.unidade, SUPPLY_TEXT, user_id, query))
+    results = union_all(*parts).subquery("resultados")
+    stmt = select(results)
+    if after is not None:
+        relevancia, recurso, row_id = after
+        stmt = stmt.where(
+            (results.c.relevancia < relevancia)
+            | ((results.c.relevancia == relevancia) & (tuple_(results.c.recurso, results.c.id) > tuple_(recurso, row_id)))
+        )
+    stmt = stmt.order_by(results.c.relevancia.desc(), results.c.recurso, results.c.id).limit(limit)
+    return rows_as_dicts(await db.execute(stmt))
+
+
+# ── Índice em memória (SQLite e Postgres sem as extensões) ─
+WORD = re.compile(r"[^\W_]+")
+
+
+def normalize(value: str) -> str:
+    # "Óleo" -> "oleo": tira os acentos (marcas combinantes) e as maiúsculas
+    decomposed = unicodedata.normalize("NFKD", value)
+    return "".join(char for char in decomposed if not unicodedata.combining(char)).lower()
+
+
+def trigrams(value: str) -> list[str]:
+    # Como o pg_trgm: cada palavra ganha dois espaços antes e um depois
+    result = []
+    for word in WORD.findall(normalize(value)):
+        padded = f"  {word} "
+        result.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+    return result
+
+
+def word_similarity(query: set[str], document: list[str]) -> float:
+    # Maior similaridade entre os trigramas da consulta e um trecho contínuo dos
+    # trigramas do documento, como o word_similarity do pg_trgm. Os melhores
+    # trechos começam e terminam em trigramas da consulta
+    hits = [i for i, trigram in enumerate(document) if trigram in query]
+    best = 0.0
+    for start in hits:
+        extent: set[str] = set()
+        common: set[str] = set()
+        for i in range(start, hits[-1] + 1):
+            extent.add(document[i])
+            if document[i] in query:
+                common.add(document[i])
+                best = max(best, len(common) / (len(query) + len(extent) - len(common)))
+    return best
+
+
+class TrigramIndex:
+    # Índice invertido trigrama -> documentos de um usuário; só os documentos que
+    # compartilham algum trigrama com a consulta têm a similaridade calculada
+    def __init__(self, rows: list[dict]):
+        self.rows = rows
+        self.documents = [trigrams(f"{row['nome']} {row['detalhe']}") for row in rows]
+        self.postings: dict[str, set[int]] = {}
+        for position, document in enumerate(self.documents):
+            for trigram in set(document):
+                self.postings.setdefault(trigram, set()).add(position)
+
+    def search(self, q: str) -> list[dict]:
+        query = set(trigrams(q))
+        candidates = set().union(*(self.postings.get(trigram, ()) for trigram in query))
+        results = []
+        for position in candidates:
+            relevancia = round(word_similarity(query, self.documents[position]), SCORE_DIGITS)
+            if relevancia >= WORD_SIMILARITY_THRESHOLD:
+                results.append({**self.rows[position], "relevancia": relevancia})
+        results.sort(key=lambda row: (-row["relevancia"], row["recurso"], row["id"]))
+        return results
+
+
+# Por usuário, junto com as versões de máquinas e insumos de quando foi montado:
+# qualquer escrita nas coleções muda a versão e o índice é remontado na próxima busca
+_indexes = TTLCache(maxsize=settings.SEARCH_INDEX_CACHE_SIZE, ttl=settings.SEARCH_INDEX_TTL_SECONDS)
+
+
+async def _user_index(db: AsyncSession, user_id: int) -> TrigramIndex:
+    versions = await get_versions(db, user_id, (MACHINES, SUPPLIES))
+    cached = _indexes.get(user_id)
+    if cached is not None and cached[0] == versions:
+        return cached[1]
+    rows = []
+    for model, recurso, detalhe in ((Machine, "maquina", Machine.tipo), (Supply, "insumo", Supply.unidade)):
+        rows += rows_as_dicts(await db.execute(
+            select(
+                literal(recurso).label("recurso"),
+                model.id.label("id"),
+                model.nome.label("nome"),
+                detalhe.label("detalhe"),
+                model.status.label("status"),
+            ).where(model.user_id == user_id)
+        ))
+    index = TrigramIndex(rows)
+    _indexes.set(user_id, (versions, index))
+    return index
+
+
+def _after(row: dict, cursor: tuple[float, str, int]) -> bool:
+    relevancia, recurso, row_id = cursor
+    return row["relevancia"] < relevancia or (
+        row["relevancia"] == relevancia and (row["recurso"], row["id"]) > (recurso, row_id)
+    )
+
+
+# ── Busca ────────────────────────────────────────────────
+async def search(
+    db: AsyncSession,
+    user_id: int,
+    q: str,
+    recursos=RESOURCES,
+    limit: int = 20,
+    cursor: Optional[str] = None,
+) -> tuple[list[dict], Optional[str]]:
+    # Resultados por relevância decrescente; devolve também o cursor da próxima página
+    after = decode_cursor(cursor) if cursor else None
+    if await trigram_available(db):
+        rows = await _search_postgres(db, user_id, q, recursos, limit + 1, after)
+    else:
+        index = await _user_index(db, user_id)
+        rows = [
+            row for row in index.search(q)
+            if row["recurso"] in recursos and (after is None or _after(row, after))
+        ][:limit + 1]
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(last["relevancia"], last["recurso"], last["id"])
+    return rows, next_cursor
@@ -1,12 +1,22 @@
-from app.database import SessionLocal, engine, Base 
+from app.database import SessionLocal, engine, Base
 from app.models import User, Machine, Maintenance, Supply, Movement, MovementType
 from app.auth import hash_password 
+from app.rollups import rebuild_cost_rollups
+from app.forecasting import rebuild_machine_forecasts, rebuild_supply_forecasts
+from app.partitions import ensure_partitions
 from datetime import datetime, timedelta
 
+# Histórico mais antigo gerado abaixo (campo "dias")
+SEED_HISTORY_DAYS = 300
+
 def init_db():
-    print("Limpar e criar tabelas...")
-    Base.metadata.drop_all(bind=engine) # Opcional: limpa tudo antes de popular
-    Base.metadata.create_all(bind=engine)
+    # O esquema vem das migrações (alembic upgrade head); aqui só se apagam os dados
+    print("Limpar tabelas...")
+    with engine.begin() as conn:
+        for table in reversed(Base.metadata.sorted_tables):
+            conn.execute(table.delete())
+        # No Postgres, partições mensais para o histórico retroativo
+        ensure_partitions(conn, datetime.now() - timedelta(days=SEED_HISTORY_DAYS), datetime.now())
 
 def seed_all():
     db = SessionLocal()
@@ -168,6 +178,10 @@ def seed_all():
             )
             db.add(mov)
 
+        db.flush()
+        rebuild_cost_rollups(db)
+        rebuild_supply_forecasts(db)
+        rebuild_machine_forecasts(db)
         db.commit()
         print("Banco de dados populado com sucesso! 🚀")
 
@@ -0,0 +1,145 @@
+import asyncio
+import logging
+from datetime import datetime
+
+from sqlalchemy import Float, Integer, column, select, update, values
+
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.models import Machine, machine_status
+from app.outbox import MACHINE_READINGS, MACHINE_STATUS_CHANGED, enqueue
+from app.versioning import MACHINES, bump_versions_for_users, next_change_ids
+
+logger = logging.getLogger("app.telemetry")
+
+# Leitura pendente por (usuário, máquina): (horimetro, data)
+Pending = dict[tuple[int, int], tuple[float, datetime]]
+
+
+# ── Coalescência em memória ──────────────────────────────
+class TelemetryCoalescer:
+    # Gateways mandam o horímetro a cada poucos minutos; entre dois flushes só a
+    # maior leitura de cada máquina interessa (o horímetro nunca volta). A chave
+    # inclui o usuário: leitura para máquina alheia não derruba a do dono e é
+    # descartada no flush, que confere a posse
+    def __init__(self):
+        self._pending: Pending = {}
+        self.wakeup = asyncio.Event()
+
+    def offer(self, user_id: int, machine_id: int, horimetro: float, data: datetime) -> bool:
+        key = (user_id, machine_id)
+        current = self._pending.get(key)
+        if current is not None and horimetro <= current[0]:
+            return False
+        self._pending[key] = (horimetro, data)
+        if len(self._pending) >= settings.TELEMETRY_MAX_PENDING:
+            self.wakeup.set()
+        return True
+
+    def _restore(self, batch: Pending) -> None:
+        # Flush que falhou devolve as leituras, sem passar por cima das mais novas
+        for key, (horimetro, data) in batch.items():
+            current = self._pending.get(key)
+            if current is None or horimetro > current[0]:
+                self._pending[key] = (horimetro, data)
+
+    async def flush(self) -> int:
+        # Troca o dicionário antes de qualquer await: leituras que chegam durante
+        # o flush vão para o próximo
+        batch, self._pending = self._pending, {}
+        items = sorted(batch.items(), key=lambda item: item[0][1])
+        applied = 0
+        size = settings.TELEMETRY_FLUSH_BATCH_SIZE
+        for start in range(0, len(items), size):
+            try:
+                applied += await apply_readings(dict(items[start:start + size]))
+            except Exception:
+                self._restore(dict(items[start:]))
+                raise
+        return applied
+
+
+telemetry = TelemetryCoalescer()
+
+
+# ── Flush em lote ────────────────────────────────────────
+def _values_update(rows: list[dict]):
+    # Um único UPDATE ... FROM (VALUES ...) para o lote inteiro
+    leituras = values(
+        column("id", Integer), column("horimetro", Float), column("change_id", Integer), name="leituras"
+    ).data([(row["id"], row["horimetro_atual"], row["change_id"]) for row in rows])
+    return (
+        update(Machine)
+        .where(Machine.id == leituras.c.id)
+        .values(horimetro_atual=leituras.c.horimetro, change_id=leituras.c.change_id)
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def apply_readings(batch: Pending) -> int:
+    # Uma transação por lote: travas nos contadores dos usuários (mesma ordem das
+    # rotas: usuário antes da máquina), depois nas máquinas, UPDATE em lote e
+    # eventos no outbox. Devolve quantas máquinas tiveram o horímetro atualizado
+    async with AsyncSessionLocal() as db:
+        change_ids = await next_change_ids(db, {user_id for user_id, _ in batch})
+        machines = (await db.execute(
+            select(
+                Machine.id, Machine.user_id, Machine.nome, Machine.horimetro_atual,
+                Machine.proxima_manutencao, Machine.intervalo_manutencao,
+            )
+            .where(Machine.id.in_({machine_id for _, machine_id in batch}))
+            .order_by(Machine.id)
+            .with_for_update(key_share=True)
+        )).all()
+
+        rows = []
+        readings: dict[int, list] = {}
+        transitions: dict[int, list] = {}
+        for machine in machines:
+            pending = batch.get((machine.user_id, machine.id))
+            if pending is None or pending[0] <= (machine.horimetro_atual or 0):
+                continue
+            horimetro, data = pending
+            rows.append({"id": machine.id, "horimetro_atual": horimetro, "change_id": change_ids[machine.user_id]})
+            readings.setdefault(machine.user_id, []).append([machine.id, data.isoformat(), horimetro])
+            # Com o horímetro só subindo, toda mudança é para "Próximo" ou "Atenção"
+            antes = machine_status(machine.horimetro_atual or 0, machine.proxima_manutencao, machine.intervalo_manutencao)
+            depois = machine_status(horimetro, machine.proxima_manutencao, machine.intervalo_manutencao)
+            if depois != antes:
+                transitions.setdefault(machine.user_id, []).append(
+                    {"id": machine.id, "nome": machine.nome, "de": antes, "para": depois, "horimetro": horimetro}
+                )
+
+        if rows:
+            if db.bind.dialect.name == "postgresql":
+                await db.execute(_values_update(rows))
+            else:
+                # O SQLite não aceita VALUES com nomes de colunas no FROM: UPDATE
+                # por chave primária em executemany, sem ida e volta pela rede
+                await db.execute(update(Machine), rows)
+            for user_id, leituras in readings.items():
+                enqueue(db, user_id, MACHINE_READINGS, {"leituras": leituras})
+            for user_id, maquinas in transitions.items():
+                enqueue(db, user_id, MACHINE_STATUS_CHANGED, {"maquinas": maquinas})
+            await bump_versions_for_users(db, readings, MACHINES)
+        await db.commit()
+    return len(rows)
+
+
+async def run_flusher(stop: asyncio.Event) -> None:
+    # Flush a cada TELEMETRY_FLUSH_INTERVAL_SECONDS, antes se o acúmulo passar de
+    # TELEMETRY_MAX_PENDING máquinas, e um último ao encerrar
+    stopping = asyncio.create_task(stop.wait())
+    while True:
+        wakeup = asyncio.create_task(telemetry.wakeup.wait())
+        await asyncio.wait(
+            [stopping, wakeup], timeout=settings.TELEMETRY_FLUSH_INTERVAL_SECONDS, return_when=asyncio.FIRST_COMPLETED
+        )
+        wakeup.cancel()
+        telemetry.wakeup.clear()
+        try:
+            await telemetry.flush()
+        except Exception:
+            logger.exception("falha no flush da telemetria")
+        if stop.is_set():
+            break
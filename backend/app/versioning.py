@@ -0,0 +1,109 @@
+import hashlib
+
+from fastapi import Depends, HTTPException, Request, Response
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.auth import Principal, get_current_user
+from app.database import dialect_insert, get_db
+from app.models import CollectionVersion, User
+from app.response_cache import canonical_query, response_cache
+
+MACHINES = "machines"
+MAINTENANCE = "maintenance"
+SUPPLIES = "supplies"
+MOVEMENTS = "movements"
+
+CACHE_CONTROL = "private, no-cache"
+
+
+# ── Escrita: change_id e versão das coleções afetadas ───
+async def next_change_id(db: AsyncSession, user_id: int) -> int:
+    # Primeira escrita de toda transação que altera dados do usuário: a trava na
+    # linha do usuário serializa as escritas dele, então os change_ids ficam na
+    # ordem dos commits e um /api/sync nunca pula uma alteração. Vir antes de
+    # qualquer outra trava mantém a mesma ordem em todas as rotas (sem deadlock)
+    return (await db.execute(
+        update(User).where(User.id == user_id).values(change_seq=User.change_seq + 1).returning(User.change_seq)
+    )).scalar_one()
+
+
+async def next_change_ids(db: AsyncSession, user_ids) -> dict[int, int]:
+    # Versão de next_change_id para escritas que tocam vários usuários (telemetria):
+    # trava as linhas em ordem de id, então duas escritas assim não se travam
+    locked = select(User.id).where(User.id.in_(set(user_ids))).order_by(User.id).with_for_update(key_share=True)
+    return dict((await db.execute(
+        update(User).where(User.id.in_(locked)).values(change_seq=User.change_seq + 1).returning(User.id, User.change_seq)
+    )).all())
+
+
+async def bump_versions(db: AsyncSession, user_id: int, *collections: str) -> None:
+    await bump_versions_for_users(db, [user_id], *collections)
+
+
+async def bump_versions_for_users(db: AsyncSession, user_ids, *collections: str) -> None:
+    # Ordem fixa das linhas: escritas concorrentes do mesmo usuário não entram em deadlock
+    user_ids = sorted(set(user_ids))
+    stmt = dialect_insert(db.bind, CollectionVersion)
+    stmt = stmt.values([
+        {"user_id": user_id, "collection": collection, "version": 1}
+        for user_id in user_ids
+        for collection in sorted(set(collections))
+    ])
+    await db.execute(stmt.on_conflict_do_update(
+        index_elements=[CollectionVersion.user_id, CollectionVersion.collection],
+        set_={"version": CollectionVersion.version + 1},
+    ))
+    # Mesmo antes do commit é seguro: a entrada guarda a versão da coleção, e o
+    # que um leitor gravar agora fica sob a versão antiga
+    for user_id in user_ids:
+        await response_cache.invalidate(user_id, *collections)
+
+
+async def get_versions(db: AsyncSession, user_id: int, collections: tuple[str, ...]) -> dict[str, int]:
+    rows = await db.execute(
+        select(CollectionVersion.collection, CollectionVersion.version).where(
+            CollectionVersion.user_id == user_id,
+            CollectionVersion.collection.in_(collections),
+        )
+    )
+    versions = dict(rows.all())
+    return {collection: versions.get(collection, 0) for collection in collections}
+
+
+# ── Leitura: ETag fraco e 304 Not Modified ───────────────
+def make_etag(user_id: int, versions: dict[str, int], request: Request) -> str:
+    # A URL entra no hash: filtros e páginas diferentes têm ETags diferentes
+    query = canonical_query(request)
+    state = ",".join(f"{c}:{v}" for c, v in sorted(versions.items()))
+    digest = hashlib.sha1(f"{user_id}|{state}|{request.url.path}?{query}".encode()).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+
+def etag_matches(etag: str, if_none_match: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    # Comparação fraca: ignora o prefixo W/
+    candidates = (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+    return etag.removeprefix("W/") in candidates
+
+
+def conditional_get(*collections: str):
+    # Dependência das rotas de listagem: responde 304 antes de qualquer consulta aos dados
+    async def dependency(
+        request: Request,
+        response: Response,
+        db: AsyncSession = Depends(get_db),
+        user: Principal = Depends(get_current_user),
+    ) -> None:
+        versions = await get_versions(db, user.id, collections)
+        request.state.collection_versions = versions
+        etag = make_etag(user.id, versions, request)
+        headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and etag_matches(etag, if_none_match):
+            raise HTTPException(status_code=304, headers=headers)
+        response.headers.update(headers)
+
+    return dependency
@@ -0,0 +1,85 @@
+"""Benchmark de logins por segundo por núcleo.
+
+Mede o custo do bcrypt isolado e o login completo (POST /api/login) com o
+pool dedicado de hash, para escolher BCRYPT_ROUNDS e PASSWORD_HASH_WORKERS.
+
+    DATABASE_URL=sqlite:///./bench.db SECRET_KEY=bench \\
+        python -m bench.login_throughput --rounds 12 --workers 4 --requests 200
+"""
+import argparse
+import asyncio
+import os
+import time
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///./bench.db")
+os.environ.setdefault("SECRET_KEY", "bench")
+# Mede o bcrypt e o pool de hash, não o limitador: o balde de login recusaria quase tudo
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+os.environ.setdefault("ADMISSION_MAX_CONCURRENT", "10000")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=12, help="custo do bcrypt (BCRYPT_ROUNDS)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="PASSWORD_HASH_WORKERS")
+    parser.add_argument("--executor", choices=("thread", "process"), default="thread")
+    parser.add_argument("--requests", type=int, default=100, help="logins concorrentes no teste completo")
+    parser.add_argument("--samples", type=int, default=10, help="hashes no teste de bcrypt isolado")
+    return parser.parse_args()
+
+
+def bench_raw_bcrypt(samples: int) -> float:
+    from app.auth import hash_password, verify_password
+
+    hashed = hash_password("senha-bench")
+    started = time.perf_counter()
+    for _ in range(samples):
+        verify_password("senha-bench", hashed)
+    return samples / (time.perf_counter() - started)
+
+
+async def bench_login(total: int) -> tuple[float, int, int]:
+    import httpx
+
+    from app.auth import password_hasher
+    from app.database import Base, engine
+    from app.main import app
+
+    Base.metadata.create_all(bind=engine)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        credentials = {"email": "bench@terraemdia.com", "password": "senha-bench"}
+        await client.post("/api/register", json={"name": "Bench", **credentials})
+
+        started = time.perf_counter()
+        responses = await asyncio.gather(*(client.post("/api/login", json=credentials) for _ in range(total)))
+        elapsed = time.perf_counter() - started
+    password_hasher.shutdown()
+
+    ok = sum(1 for r in responses if r.status_code == 200)
+    # 503: fila do pool de hash cheia; 429: limitador, se ligado por fora
+    overloaded = sum(1 for r in responses if r.status_code == 503)
+    limited = sum(1 for r in responses if r.status_code == 429)
+    return ok / elapsed, overloaded, limited
+
+
+def main():
+    args = parse_args()
+    os.environ["BCRYPT_ROUNDS"] = str(args.rounds)
+    os.environ["PASSWORD_HASH_WORKERS"] = str(args.workers)
+    os.environ["PASSWORD_HASH_EXECUTOR"] = args.executor
+    os.environ.setdefault("PASSWORD_HASH_QUEUE_SIZE", str(args.requests))
+
+    cores = min(args.workers, os.cpu_count() or 1)
+    per_core = bench_raw_bcrypt(args.samples)
+    print(f"bcrypt isolado (rounds={args.rounds}): {per_core:.1f} verificações/s em 1 núcleo")
+
+    rate, overloaded, limited = asyncio.run(bench_login(args.requests))
+    print(
+        f"login completo: {rate:.1f} logins/s com {args.workers} workers ({args.executor}) "
+        f"= {rate / cores:.1f} logins/s por núcleo; recusados (503): {overloaded}; limitados (429): {limited}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""Benchmark da API por rota: latência p50/p99 e requisições por segundo.
+
+Roda contra o app em processo (ASGI, usando DATABASE_URL) ou contra um
+servidor já no ar (--base-url). Compara com bench/baseline.json e sai com
+código 1 se algum cenário piorar além da tolerância.
+
+A comparação não usa tempos absolutos, que dependem da máquina: cada rodada
+mede antes o cenário de referência (GET /api/, sem banco) e cada cenário é
+comparado em múltiplos dele (p50 / p50 da referência, req/s / req/s da
+referência). Um baseline gravado num notebook vale no CI. O p99 é só
+informativo: com poucas centenas de requisições ele oscila demais para servir
+de critério.
+
+    # popular o banco antes (ver bench/generate_data.py)
+    DATABASE_URL=sqlite:///./bench.db SECRET_KEY=bench python -m bench.run_api --email bench1@terraemdia.com
+
+    # gravar um novo baseline depois de uma melhoria intencional
+    python -m bench.run_api --email bench1@terraemdia.com --save-baseline
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///./bench.db")
+os.environ.setdefault("SECRET_KEY", "bench")
+# O benchmark mede latência, não o limitador; com --base-url, subir o servidor assim também
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+
+BASELINE_PATH = Path(__file__).with_name("baseline.json")
+# Custo fixo por requisição (middlewares, roteamento) nesta máquina
+REFERENCE = ("referencia", "GET", "/api/", None, 1)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--email", default="bench1@terraemdia.com")
+    parser.add_argument("--password", default="bench123")
+    parser.add_argument("--base-url", help="servidor já no ar; por padrão usa o app em processo")
+    parser.add_argument("--requests", type=int, default=200, help="requisições por cenário")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--only", help="roda apenas cenários cujo nome contém este texto")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="piora relativa aceita (0.5 = 50%%)")
+    return parser.parse_args()
+
+
+def scenarios(machine_id: int, supply_id: int):
+    # (nome, método, caminho, corpo, fração das requisições)
+    return [
+        ("auth.login", "POST", "/api/login", "login", 0.1),
+        ("auth.me", "GET", "/api/me", None, 1),
+        ("machines.list", "GET", "/api/machines", None, 1),
+        ("machines.status", "GET", "/api/machines?status=Atenção", None, 1),
+        ("maintenance.history", "GET", f"/api/maintenance/{machine_id}?limit=50", None, 1),
+        ("maintenance.create", "POST", "/api/maintenance", {
+            "machine_id": machine_id, "descricao": "Benchmark", "horimetro_no_momento": 1000, "custo": 10,
+        }, 1),
+        ("supplies.list", "GET", "/api/supplies", None, 1),
+        ("movements.history", "GET", f"/api/movements/{supply_id}?limit=50", None, 1),
+        ("movements.create", "POST", "/api/movements", {
+            "supply_id": supply_id, "tipo": "entrada", "quantidade": 1,
+        }, 1),
+        ("dashboard", "GET", "/api/dashboard", None, 1),
+    ]
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = max(int(round(pct / 100 * len(ordered))) - 1, 0)
+    return ordered[index]
+
+
+async def run_scenario(client, method, path, body, headers, total, concurrency):
+    latencies = []
+    errors = 0
+    remaining = total
+
+    async def worker():
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            started = time.perf_counter()
+            response = await client.request(method, path, json=body, headers=headers)
+            latencies.append((time.perf_counter() - started) * 1000)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "rps": round(len(latencies) / elapsed, 1),
+    }
+
+
+async def run(args) -> dict:
+    import httpx
+
+    if args.base_url:
+        client = httpx.AsyncClient(base_url=args.base_url, timeout=60)
+    else:
+        from app.main import app
+
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=60)
+
+    results = {}
+    async with client:
+        credentials = {"email": args.email, "password": args.password}
+        login = await client.post("/api/login", json=credentials)
+        if login.status_code != 200:
+            sys.exit(f"login falhou para {args.email}: {login.text}")
+        headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+
+        machines = (await client.get("/api/machines", headers=headers)).json()
+        supplies = (await client.get("/api/supplies", headers=headers)).json()
+        if not machines or not supplies:
+            sys.exit(f"{args.email} não tem máquinas ou insumos; rode bench.generate_data antes")
+
+        for name, method, path, body, share in [REFERENCE, *scenarios(machines[0]["id"], supplies[0]["id"])]:
+            if args.only and args.only not in name and name != REFERENCE[0]:
+                continue
+            if body == "login":
+                body = credentials
+            total = max(int(args.requests * share), args.concurrency)
+            results[name] = await run_scenario(client, method, path, body, headers, total, args.concurrency)
+
+    reference = results[REFERENCE[0]]
+    for r in results.values():
+        r["p50_rel"] = round(r["p50_ms"] / reference["p50_ms"], 2)
+        r["rps_rel"] = round(r["rps"] / reference["rps"], 4)
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    regressions = []
+    for name, current in results.items():
+        reference = baseline.get(name)
+        if not reference or name == REFERENCE[0]:
+            continue
+        if current["p50_rel"] > reference["p50_rel"] * (1 + tolerance):
+            regressions.append(f"{name}: p50 {current['p50_rel']}x a referência > baseline {reference['p50_rel']}x")
+        if current["rps_rel"] < reference["rps_rel"] * (1 - tolerance):
+            regressions.append(f"{name}: req/s {current['rps_rel']}x a referência < baseline {reference['rps_rel']}x")
+    return regressions
+
+
+def main():
+    args = parse_args()
+    results = asyncio.run(run(args))
+
+    print(f"{'cenário':<22}{'req':>6}{'erros':>7}{'p50 ms':>10}{'p99 ms':>10}{'req/s':>10}{'p50 rel':>10}{'req/s rel':>11}")
+    for name, r in results.items():
+        print(
+            f"{name:<22}{r['requests']:>6}{r['errors']:>7}{r['p50_ms']:>10}{r['p99_ms']:>10}{r['rps']:>10}"
+            f"{r['p50_rel']:>10}{r['rps_rel']:>11}"
+        )
+
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(results, indent=2, ensure_ascii=False) + "\n")
+        print(f"baseline gravado em {args.baseline}")
+        return
+
+    if not args.baseline.exists():
+        print("sem baseline para comparar; use --save-baseline")
+        return
+    regressions = compare(results, json.loads(args.baseline.read_text()), args.tolerance)
+    for line in regressions:
+        print(f"REGRESSÃO {line}")
+    if any(r["errors"] for r in results.values()):
+        regressions.append("erros")
+        print("REGRESSÃO cenários com respostas de erro")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
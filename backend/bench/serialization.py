@@ -0,0 +1,106 @@
+"""Custo de montar uma listagem grande: ORM + Pydantic versus colunas + orjson.
+
+Compara, para N linhas de máquinas e de manutenções num SQLite em memória:
+
+  antes   select(Modelo) -> objetos ORM -> validação from_attributes -> JSON
+          (o que o FastAPI fazia com response_model)
+  depois  select(colunas) -> dicts -> orjson (caminho rápido das rotas)
+
+    python -m bench.serialization --rows 10000
+"""
+import argparse
+import json
+import os
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+os.environ.setdefault("SECRET_KEY", "bench")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    return parser.parse_args()
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    args = parse_args()
+
+    from pydantic import TypeAdapter
+    from sqlalchemy import create_engine, select
+    from sqlalchemy.orm import Session
+
+    from app.database import Base
+    from app.models import (
+        MACHINE_OUT_COLUMNS, MAINTENANCE_OUT_COLUMNS, Machine, Maintenance, User,
+    )
+    from app.responses import dump_json, rows_as_dicts
+    from app.schemas import MachineOut, MaintenanceOut
+
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    now = datetime.now(timezone.utc)
+    with engine.begin() as conn:
+        conn.execute(User.__table__.insert(), [{"id": 1, "email": "b@b", "hashed_password": "x", "name": "b"}])
+        conn.execute(Machine.__table__.insert(), [
+            {
+                "id": i, "user_id": 1, "nome": f"Trator {i}", "tipo": "Trator",
+                "horimetro_atual": i % 500, "intervalo_manutencao": 250, "proxima_manutencao": 400,
+                "created_at": now,
+            }
+            for i in range(1, args.rows + 1)
+        ])
+        conn.execute(Maintenance.__table__.insert(), [
+            {
+                "id": i, "machine_id": 1, "descricao": "Troca de óleo", "horimetro_no_momento": i,
+                "data": now - timedelta(minutes=i), "custo": 100.0, "observacao": "",
+            }
+            for i in range(1, args.rows + 1)
+        ])
+
+    cases = [
+        ("máquinas", Machine, MachineOut, MACHINE_OUT_COLUMNS),
+        ("manutenções", Maintenance, MaintenanceOut, MAINTENANCE_OUT_COLUMNS),
+    ]
+    print(f"{args.rows} linhas, mediana de {args.repeat} execuções (ms)")
+    print(f"{'listagem':<14}{'caminho':<10}{'consulta':>10}{'serializa':>11}{'total':>9}")
+    with Session(engine) as db:
+        for label, model, schema, columns in cases:
+            adapter = TypeAdapter(list[schema])
+
+            def orm_query():
+                db.expunge_all()
+                return db.scalars(select(model)).all()
+
+            def orm_serialize(rows):
+                content = adapter.dump_python(adapter.validate_python(rows, from_attributes=True), mode="json")
+                return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode()
+
+            def fast_query():
+                return rows_as_dicts(db.execute(select(*columns)))
+
+            orm_rows = orm_query()
+            fast_rows = fast_query()
+            results = {
+                "antes": (timed(orm_query, args.repeat), timed(lambda: orm_serialize(orm_rows), args.repeat)),
+                "depois": (timed(fast_query, args.repeat), timed(lambda: dump_json(fast_rows), args.repeat)),
+            }
+            assert json.loads(orm_serialize(orm_rows)) == json.loads(dump_json(fast_rows))
+            for path, (query_ms, serialize_ms) in results.items():
+                print(f"{label:<14}{path:<10}{query_ms:>10.1f}{serialize_ms:>11.1f}{query_ms + serialize_ms:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+import re
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy import create_engine
+from sqlalchemy.pool import NullPool
+
+from app.config import settings
+from app.database import Base
+import app.models  # noqa: F401  (registra as tabelas no metadata)
+
+config = context.config
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+# O Postgres guarda índices de expressão normalizados (casts, quebras de linha):
+# o autogenerate os veria sempre como alterados
+EXPRESSION_INDEXES = {"ix_machines_user_id_status", "ix_supplies_user_id_status"}
+# Índices GIN de busca (migração 0006): dependem de extensões e ficam fora do metadata
+SEARCH_INDEXES = {"ix_machines_busca", "ix_supplies_busca"}
+# Partições mensais e padrão (app/partitions.py, migração 0007) existem só no banco, não no metadata
+PARTITION = re.compile(r"^(maintenances|movements)_(p\d{4}_\d{2}|default)$")
+
+
+def include_object(obj, name, type_, reflected, compare_to):
+    if type_ == "index":
+        return name not in EXPRESSION_INDEXES | SEARCH_INDEXES and not PARTITION.match(obj.table.name)
+    return not (type_ == "table" and PARTITION.match(name))
+
+
+def run_migrations_offline() -> None:
+    context.configure(
+        url=settings.DATABASE_URL,
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online() -> None:
+    # Engine próprio, sem pool e sem o statement_timeout da aplicação:
+    # CREATE INDEX CONCURRENTLY numa tabela grande passa do limite das requisições
+    connectable = create_engine(settings.DATABASE_URL, poolclass=NullPool)
+    with connectable.connect() as connection:
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            include_object=include_object,
+            # SQLite não altera colunas no lugar: recria a tabela em lote
+            render_as_batch=connection.dialect.name == "sqlite",
+        )
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
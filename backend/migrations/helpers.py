@@ -0,0 +1,37 @@
+from alembic import op
+import sqlalchemy as sa
+
+
+def create_indexes_concurrently(indexes) -> None:
+    # indexes: [(nome, tabela, colunas, opções)]. No Postgres, CREATE INDEX
+    # CONCURRENTLY fora da transação da migração, sem travar escritas
+    bind = op.get_bind()
+    postgres = bind.dialect.name == "postgresql"
+    with op.get_context().autocommit_block():
+        for name, table, columns, options in indexes:
+            if postgres:
+                # Um CONCURRENTLY interrompido deixa o índice INVALID; IF NOT EXISTS o
+                # pularia, então ele é removido para ser criado de novo
+                invalid = bind.execute(
+                    sa.text(
+                        "SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+                        "WHERE c.relname = :name AND NOT i.indisvalid"
+                    ),
+                    {"name": name},
+                ).first()
+                if invalid:
+                    op.drop_index(name, table_name=table, postgresql_concurrently=True)
+            op.create_index(
+                name, table, columns, if_not_exists=True, postgresql_concurrently=postgres, **options
+            )
+
+
+def drop_indexes_concurrently(indexes) -> None:
+    postgres = op.get_bind().dialect.name == "postgresql"
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in reversed(indexes):
+            op.drop_index(name, table_name=table, if_exists=True, postgresql_concurrently=postgres)
+
+
+def has_column(table: str, column: str) -> bool:
+    return column in {c["name"] for c in sa.inspect(op.get_bind()).get_columns(table)}
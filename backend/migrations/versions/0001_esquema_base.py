@@ -0,0 +1,95 @@
+"""esquema base: usuários, máquinas, manutenções, insumos e movimentações
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+
+Bancos criados pelo antigo create_all na inicialização já têm estas tabelas:
+só o que falta é criado, e o banco passa a ser controlado pelo Alembic.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def _missing(table: str) -> bool:
+    return not sa.inspect(op.get_bind()).has_table(table)
+
+
+def upgrade() -> None:
+    if _missing("users"):
+        op.create_table(
+            "users",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("email", sa.String(), nullable=False),
+            sa.Column("hashed_password", sa.String(), nullable=False),
+            sa.Column("name", sa.String(), nullable=False),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        )
+        op.create_index("ix_users_id", "users", ["id"])
+        op.create_index("ix_users_email", "users", ["email"], unique=True)
+
+    if _missing("machines"):
+        op.create_table(
+            "machines",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+            sa.Column("nome", sa.String(), nullable=False),
+            sa.Column("tipo", sa.String(), nullable=False),
+            sa.Column("horimetro_atual", sa.Float()),
+            sa.Column("intervalo_manutencao", sa.Float(), nullable=False),
+            sa.Column("proxima_manutencao", sa.Float(), nullable=False),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        )
+        op.create_index("ix_machines_id", "machines", ["id"])
+
+    if _missing("maintenances"):
+        op.create_table(
+            "maintenances",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("machine_id", sa.Integer(), sa.ForeignKey("machines.id"), nullable=False),
+            sa.Column("descricao", sa.String(), nullable=False),
+            sa.Column("horimetro_no_momento", sa.Float(), nullable=False),
+            sa.Column("data", sa.DateTime(timezone=True), server_default=sa.func.now()),
+            sa.Column("custo", sa.Float()),
+            sa.Column("observacao", sa.String()),
+        )
+        op.create_index("ix_maintenances_id", "maintenances", ["id"])
+
+    if _missing("supplies"):
+        op.create_table(
+            "supplies",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+            sa.Column("nome", sa.String(), nullable=False),
+            sa.Column("unidade", sa.String(), nullable=False),
+            sa.Column("quantidade_atual", sa.Float()),
+            sa.Column("quantidade_minima", sa.Float()),
+            sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        )
+        op.create_index("ix_supplies_id", "supplies", ["id"])
+
+    if _missing("movements"):
+        op.create_table(
+            "movements",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("supply_id", sa.Integer(), sa.ForeignKey("supplies.id"), nullable=False),
+            sa.Column("tipo", sa.Enum("entrada", "saida", name="movementtype"), nullable=False),
+            sa.Column("quantidade", sa.Float(), nullable=False),
+            sa.Column("data", sa.DateTime(timezone=True), server_default=sa.func.now()),
+            sa.Column("observacao", sa.String()),
+        )
+        op.create_index("ix_movements_id", "movements", ["id"])
+
+
+def downgrade() -> None:
+    op.drop_table("movements")
+    sa.Enum(name="movementtype").drop(op.get_bind(), checkfirst=True)
+    op.drop_table("supplies")
+    op.drop_table("maintenances")
+    op.drop_table("machines")
+    op.drop_table("users")
@@ -0,0 +1,101 @@
+"""versão do token, agregados, previsões, versões de coleção e outbox
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+
+Tudo o que o create_all acrescentou depois do esquema base. Como em 0001,
+o que já existir num banco antigo é mantido.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from migrations.helpers import has_column
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def _missing(table: str) -> bool:
+    return not sa.inspect(op.get_bind()).has_table(table)
+
+
+def upgrade() -> None:
+    if not has_column("users", "token_version"):
+        op.add_column("users", sa.Column("token_version", sa.Integer(), nullable=False, server_default="0"))
+
+    if _missing("maintenance_cost_rollups"):
+        op.create_table(
+            "maintenance_cost_rollups",
+            sa.Column("machine_id", sa.Integer(), sa.ForeignKey("machines.id"), primary_key=True),
+            sa.Column("mes", sa.Date(), primary_key=True),
+            sa.Column("quantidade", sa.Integer(), nullable=False),
+            sa.Column("custo_total", sa.Float(), nullable=False),
+            sa.Column("ultimo_horimetro", sa.Float(), nullable=False),
+            sa.Column("ultima_data", sa.DateTime(timezone=True), nullable=False),
+        )
+
+    if _missing("machine_forecasts"):
+        op.create_table(
+            "machine_forecasts",
+            sa.Column("machine_id", sa.Integer(), sa.ForeignKey("machines.id"), primary_key=True),
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+            sa.Column("peso", sa.Float(), nullable=False),
+            sa.Column("soma_t", sa.Float(), nullable=False),
+            sa.Column("soma_h", sa.Float(), nullable=False),
+            sa.Column("soma_tt", sa.Float(), nullable=False),
+            sa.Column("soma_th", sa.Float(), nullable=False),
+            sa.Column("ultima_leitura", sa.DateTime(timezone=True)),
+            sa.Column("ultimo_horimetro", sa.Float()),
+            sa.Column("horas_por_dia", sa.Float()),
+            sa.Column("data_prevista", sa.DateTime(timezone=True)),
+        )
+
+    if _missing("supply_forecasts"):
+        op.create_table(
+            "supply_forecasts",
+            sa.Column("supply_id", sa.Integer(), sa.ForeignKey("supplies.id"), primary_key=True),
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+            sa.Column("consumo_ponderado", sa.Float(), nullable=False),
+            sa.Column("inicio", sa.DateTime(timezone=True), nullable=False),
+        )
+
+    if _missing("collection_versions"):
+        op.create_table(
+            "collection_versions",
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), primary_key=True),
+            sa.Column("collection", sa.String(), primary_key=True),
+            sa.Column("version", sa.Integer(), nullable=False),
+        )
+
+    if _missing("outbox_events"):
+        op.create_table(
+            "outbox_events",
+            sa.Column("id", sa.Integer(), primary_key=True),
+            sa.Column("user_id", sa.Integer(), nullable=False),
+            sa.Column("tipo", sa.String(), nullable=False),
+            sa.Column("payload", sa.JSON(), nullable=False),
+            sa.Column("criado_em", sa.DateTime(timezone=True), server_default=sa.func.now()),
+            sa.Column("processado_em", sa.DateTime(timezone=True)),
+            sa.Column("tentativas", sa.Integer(), nullable=False, server_default="0"),
+            sa.Column("erro", sa.String()),
+        )
+
+    if _missing("outbox_deliveries"):
+        op.create_table(
+            "outbox_deliveries",
+            sa.Column("event_id", sa.Integer(), sa.ForeignKey("outbox_events.id"), primary_key=True),
+            sa.Column("handler", sa.String(), primary_key=True),
+        )
+
+
+def downgrade() -> None:
+    op.drop_table("outbox_deliveries")
+    op.drop_table("outbox_events")
+    op.drop_table("collection_versions")
+    op.drop_table("supply_forecasts")
+    op.drop_table("machine_forecasts")
+    op.drop_table("maintenance_cost_rollups")
+    op.drop_column("users", "token_version")
@@ -0,0 +1,57 @@
+"""índices das chaves estrangeiras e das consultas quentes, criados sem bloquear escritas
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+
+Cada chave estrangeira das tabelas de dados é a primeira coluna de um índice
+composto, que atende também as buscas só pela FK (listagem por usuário, JOIN
+e DELETE em cascata). Bancos criados pelo create_all antes destes índices
+existirem nunca os ganharam, porque o create_all não mexe em tabelas já criadas.
+
+No Postgres os índices são criados com CREATE INDEX CONCURRENTLY, fora da
+transação da migração, para não travar escritas em tabelas grandes.
+"""
+import sqlalchemy as sa
+
+from migrations.helpers import create_indexes_concurrently, drop_indexes_concurrently
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+MACHINE_STATUS = (
+    "(CASE WHEN (horimetro_atual >= proxima_manutencao) THEN 'Atenção' "
+    "WHEN (proxima_manutencao - horimetro_atual <= intervalo_manutencao * 0.1) THEN 'Próximo' "
+    "ELSE 'OK' END)"
+)
+SUPPLY_STATUS = "(CASE WHEN (quantidade_atual <= quantidade_minima) THEN 'Estoque Baixo' ELSE 'OK' END)"
+
+# (nome, tabela, colunas, opções)
+INDEXES = [
+    ("ix_machines_user_id_status", "machines", ["user_id", sa.text(MACHINE_STATUS)], {}),
+    ("ix_supplies_user_id_status", "supplies", ["user_id", sa.text(SUPPLY_STATUS)], {}),
+    ("ix_maintenances_machine_id_data", "maintenances", ["machine_id", "data", "id"], {}),
+    ("ix_movements_supply_id_data", "movements", ["supply_id", "data", "id"], {}),
+    ("ix_machine_forecasts_user_id_data_prevista", "machine_forecasts", ["user_id", "data_prevista"], {}),
+    ("ix_supply_forecasts_user_id", "supply_forecasts", ["user_id"], {}),
+    ("ix_outbox_events_processado_em", "outbox_events", ["processado_em"], {}),
+    (
+        "ix_outbox_events_pendentes",
+        "outbox_events",
+        ["id"],
+        {
+            "postgresql_where": sa.text("processado_em IS NULL"),
+            "sqlite_where": sa.text("processado_em IS NULL"),
+        },
+    ),
+]
+
+
+def upgrade() -> None:
+    create_indexes_concurrently(INDEXES)
+
+
+def downgrade() -> None:
+    drop_indexes_concurrently(INDEXES)
@@ -0,0 +1,56 @@
+"""sincronização offline: updated_at, lápides (deleted_at) e change_id
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+
+Linhas existentes ficam com change_id 0: entram no retrato completo (sync sem
+since) e não no delta. O DEFAULT now() é estável, então o Postgres não reescreve
+as tabelas ao adicionar updated_at; no SQLite o valor vem do default do modelo.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from migrations.helpers import create_indexes_concurrently, drop_indexes_concurrently, has_column
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+TABLES = ("machines", "maintenances", "supplies", "movements")
+
+INDEXES = [
+    ("ix_machines_user_id_change_id", "machines", ["user_id", "change_id"], {}),
+    ("ix_supplies_user_id_change_id", "supplies", ["user_id", "change_id"], {}),
+    ("ix_maintenances_machine_id_change_id", "maintenances", ["machine_id", "change_id"], {}),
+    ("ix_movements_supply_id_change_id", "movements", ["supply_id", "change_id"], {}),
+]
+
+
+def upgrade() -> None:
+    if not has_column("users", "change_seq"):
+        op.add_column("users", sa.Column("change_seq", sa.Integer(), nullable=False, server_default="0"))
+    sqlite = op.get_bind().dialect.name == "sqlite"
+    for table in TABLES:
+        if not has_column(table, "change_id"):
+            if sqlite:
+                # SQLite não aceita DEFAULT não constante em ADD COLUMN
+                op.add_column(table, sa.Column("updated_at", sa.DateTime(timezone=True)))
+                op.execute(f"UPDATE {table} SET updated_at = CURRENT_TIMESTAMP")
+            else:
+                op.add_column(table, sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now()))
+            op.add_column(table, sa.Column("deleted_at", sa.DateTime(timezone=True)))
+            op.add_column(table, sa.Column("change_id", sa.Integer(), nullable=False, server_default="0"))
+    create_indexes_concurrently(INDEXES)
+
+
+def downgrade() -> None:
+    drop_indexes_concurrently(INDEXES)
+    # DROP COLUMN direto (SQLite 3.35+): o modo batch recriaria as tabelas e
+    # perderia os índices de expressão de status
+    for table in reversed(TABLES):
+        op.drop_column(table, "change_id")
+        op.drop_column(table, "deleted_at")
+        op.drop_column(table, "updated_at")
+    op.drop_column("users", "change_seq")
@@ -0,0 +1,151 @@
+"""históricos de manutenções e movimentações particionados por mês de `data`
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18
+
+No Postgres, cada tabela é recriada como PARTITION BY RANGE (data), com uma
+partição por mês (nome <tabela>_pAAAA_MM, limites em UTC), e os dados são
+copiados. A chave primária passa a ser (id, data), porque o Postgres exige a
+chave de partição em toda restrição única. O ORM continua identificando as
+linhas só por id, que vem da mesma sequência. Roda numa única transação e
+reescreve as duas tabelas: aplicar numa janela de manutenção.
+
+As partições futuras são criadas por app/partitions.py. No SQLite as tabelas
+continuam comuns; só `data` passa a ser NOT NULL, como no Postgres.
+"""
+from datetime import date, datetime, timezone
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+MONTHS_AHEAD = 3
+
+COMMON = """
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT now(),
+    deleted_at TIMESTAMP WITH TIME ZONE,
+    change_id INTEGER DEFAULT '0' NOT NULL
+"""
+
+TABLES = {
+    "maintenances": {
+        "columns": """
+            id INTEGER NOT NULL DEFAULT nextval('maintenances_id_seq'),
+            machine_id INTEGER NOT NULL REFERENCES machines (id),
+            descricao VARCHAR NOT NULL,
+            horimetro_no_momento FLOAT NOT NULL,
+            data TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+            custo FLOAT,
+            observacao VARCHAR,
+        """ + COMMON,
+        "names": "id, machine_id, descricao, horimetro_no_momento, data, custo, observacao, "
+                 "updated_at, deleted_at, change_id",
+        "indexes": {
+            "ix_maintenances_id": "(id)",
+            "ix_maintenances_machine_id_data": "(machine_id, data, id)",
+            "ix_maintenances_machine_id_change_id": "(machine_id, change_id)",
+        },
+    },
+    "movements": {
+        "columns": """
+            id INTEGER NOT NULL DEFAULT nextval('movements_id_seq'),
+            supply_id INTEGER NOT NULL REFERENCES supplies (id),
+            tipo movementtype NOT NULL,
+            quantidade FLOAT NOT NULL,
+            data TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+            observacao VARCHAR,
+        """ + COMMON,
+        "names": "id, supply_id, tipo, quantidade, data, observacao, updated_at, deleted_at, change_id",
+        "indexes": {
+            "ix_movements_id": "(id)",
+            "ix_movements_supply_id_data": "(supply_id, data, id)",
+            "ix_movements_supply_id_change_id": "(supply_id, change_id)",
+        },
+    },
+}
+
+
+def _add_months(value: date, months: int) -> date:
+    index = value.year * 12 + value.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _bound(month: date) -> str:
+    return f"'{month.isoformat()} 00:00:00+00'"
+
+
+def _rename_old(table: str) -> str:
+    # Libera os nomes globais (tabela, PK e índices) para a tabela nova
+    old = f"{table}_antiga"
+    op.execute(f"ALTER TABLE {table} RENAME TO {old}")
+    op.execute(f"ALTER TABLE {old} RENAME CONSTRAINT {table}_pkey TO {old}_pkey")
+    op.execute(f"ALTER SEQUENCE {table}_id_seq OWNED BY NONE")
+    for index in TABLES[table]["indexes"]:
+        op.execute(f"DROP INDEX IF EXISTS {index}")
+    return old
+
+
+def _create_indexes(table: str) -> None:
+    for index, columns in TABLES[table]["indexes"].items():
+        op.execute(f"CREATE INDEX {index} ON {table} {columns}")
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql":
+        for table in TABLES:
+            op.execute(f"UPDATE {table} SET data = CURRENT_TIMESTAMP WHERE data IS NULL")
+            with op.batch_alter_table(table) as batch:
+                batch.alter_column("data", existing_type=sa.DateTime(timezone=True), nullable=False)
+        return
+
+    today = datetime.now(timezone.utc).date().replace(day=1)
+    for table, spec in TABLES.items():
+        old = _rename_old(table)
+        op.execute(
+            f"CREATE TABLE {table} ({spec['columns']}, PRIMARY KEY (id, data)) PARTITION BY RANGE (data)"
+        )
+        op.execute(f"ALTER SEQUENCE {table}_id_seq OWNED BY {table}.id")
+
+        first, last = bind.execute(sa.text(f"SELECT min(data), max(data) FROM {old}")).one()
+        month = min(date(first.year, first.month, 1) if first else today, today)
+        end = max(date(last.year, last.month, 1) if last else today, _add_months(today, MONTHS_AHEAD))
+        while month <= end:
+            op.execute(
+                f"CREATE TABLE {table}_p{month:%Y_%m} PARTITION OF {table} "
+                f"FOR VALUES FROM ({_bound(month)}) TO ({_bound(_add_months(month, 1))})"
+            )
+            month = _add_months(month, 1)
+
+        # Linhas antigas sem data (a coluna aceitava NULL) entram no mês corrente
+        names = spec["names"]
+        op.execute(
+            f"INSERT INTO {table} ({names}) "
+            f"SELECT {names.replace('data,', 'COALESCE(data, now()) AS data,', 1)} FROM {old}"
+        )
+        op.execute(f"DROP TABLE {old}")
+        _create_indexes(table)
+        op.execute(f"ANALYZE {table}")
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql":
+        for table in TABLES:
+            with op.batch_alter_table(table) as batch:
+                batch.alter_column("data", existing_type=sa.DateTime(timezone=True), nullable=True)
+        return
+
+    # Partições já arquivadas (fora do esquema atual) não voltam para a tabela
+    for table, spec in TABLES.items():
+        old = _rename_old(table)
+        op.execute(f"CREATE TABLE {table} ({spec['columns']}, PRIMARY KEY (id))")
+        op.execute(f"ALTER SEQUENCE {table}_id_seq OWNED BY {table}.id")
+        op.execute(f"INSERT INTO {table} ({spec['names']}) SELECT {spec['names']} FROM {old}")
+        op.execute(f"DROP TABLE {old}")
+        _create_indexes(table)
@@ -0,0 +1,76 @@
+"""busca sem acento em máquinas e insumos: pg_trgm, unaccent e índices GIN
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18
+
+unaccent() é STABLE (depende do dicionário) e não pode entrar em índice; o
+invólucro f_unaccent fixa o dicionário e se declara IMMUTABLE. Os índices GIN
+de trigramas cobrem exatamente as expressões que app/search.py consulta.
+
+Só no Postgres, e só se as duas extensões estiverem disponíveis no servidor:
+sem elas (e no SQLite) a busca usa o índice em memória de app/search.py.
+"""
+import sqlalchemy as sa
+from alembic import op
+
+from migrations.helpers import create_indexes_concurrently, drop_indexes_concurrently
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+EXTENSIONS = ("pg_trgm", "unaccent")
+
+# (nome, tabela, colunas, opções); as expressões batem com app/search.py
+INDEXES = [
+    (
+        "ix_machines_busca",
+        "machines",
+        [sa.text("lower(f_unaccent(nome || ' ' || tipo)) gin_trgm_ops")],
+        {"postgresql_using": "gin"},
+    ),
+    (
+        "ix_supplies_busca",
+        "supplies",
+        [sa.text("lower(f_unaccent(nome || ' ' || unidade)) gin_trgm_ops")],
+        {"postgresql_using": "gin"},
+    ),
+]
+
+
+def _available() -> bool:
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql":
+        return False
+    found = bind.execute(
+        sa.text("SELECT count(*) FROM pg_available_extensions WHERE name = ANY(:names)"),
+        {"names": list(EXTENSIONS)},
+    ).scalar()
+    return found == len(EXTENSIONS)
+
+
+def upgrade() -> None:
+    if not _available():
+        return
+    for extension in EXTENSIONS:
+        op.execute(f"CREATE EXTENSION IF NOT EXISTS {extension}")
+    # Esquema explícito: o autovacuum e o ANALYZE avaliam o índice com search_path vazio
+    schema = op.get_bind().execute(
+        sa.text("SELECT extnamespace::regnamespace::text FROM pg_extension WHERE extname = 'unaccent'")
+    ).scalar()
+    op.execute(
+        "CREATE OR REPLACE FUNCTION f_unaccent(text) RETURNS text "
+        "LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT "
+        f"AS $$ SELECT {schema}.unaccent('{schema}.unaccent'::regdictionary, $1) $$"
+    )
+    create_indexes_concurrently(INDEXES)
+
+
+def downgrade() -> None:
+    # As extensões ficam: podem ter outros usos no banco
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    drop_indexes_concurrently(INDEXES)
+    op.execute("DROP FUNCTION IF EXISTS f_unaccent(text)")
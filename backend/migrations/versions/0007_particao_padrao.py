@@ -0,0 +1,51 @@
+"""partição padrão nos históricos particionados
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18
+
+Sem uma partição DEFAULT, um INSERT com `data` num mês ainda sem partição
+falha, o que acontece se a manutenção de app/partitions.py atrasar na virada do
+mês ou se chegar um lançamento retroativo anterior à primeira partição. A
+partição <tabela>_default recebe essas linhas, e app/partitions.py as move
+para a partição mensal quando ela é criada.
+
+Só no Postgres; no SQLite as tabelas não são particionadas.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+TABLES = ("maintenances", "movements")
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    for table in TABLES:
+        op.execute(f"CREATE TABLE IF NOT EXISTS {table}_default PARTITION OF {table} DEFAULT")
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql":
+        return
+    # As linhas da partição padrão ganham partições mensais antes de ela sair
+    for table in TABLES:
+        default = f"{table}_default"
+        op.execute(f"ALTER TABLE {table} DETACH PARTITION {default}")
+        months = bind.execute(sa.text(
+            f"SELECT DISTINCT date_trunc('month', data AT TIME ZONE 'UTC')::date FROM {default}"
+        )).scalars()
+        for month in months:
+            end = month.replace(year=month.year + month.month // 12, month=month.month % 12 + 1)
+            op.execute(
+                f"CREATE TABLE {table}_p{month:%Y_%m} PARTITION OF {table} "
+                f"FOR VALUES FROM ('{month.isoformat()} 00:00:00+00') TO ('{end.isoformat()} 00:00:00+00')"
+            )
+        op.execute(f"INSERT INTO {table} SELECT * FROM {default}")
+        op.execute(f"DROP TABLE {default}")
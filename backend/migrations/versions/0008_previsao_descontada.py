@@ -0,0 +1,126 @@
+"""previsões com o estado descontado até a última leitura
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18
+
+Os pesos das previsões eram exp((t - 2020-01-01) / tau) e cresciam sem limite:
+com meia-vida curta (FORECAST_HALF_LIFE_DAYS=2) estouravam o float em poucos
+anos. Agora o estado fica descontado até a última saída do insumo
+(supply_forecasts.ultima_saida, nova) e até a última leitura da máquina
+(machine_forecasts.ultima_leitura). Esta migração reescala o estado existente
+com as meias-vidas configuradas em app/config.py.
+
+Linhas que já tinham estourado (infinito/NaN) continuam inválidas: recalcule
+com `python -m app.rollups rebuild`.
+"""
+import math
+from datetime import datetime, timezone
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.config import settings
+from migrations.helpers import has_column
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+EPOCH = datetime(2020, 1, 1, tzinfo=timezone.utc)
+SUPPLY_TAU_DAYS = settings.FORECAST_HALF_LIFE_DAYS / math.log(2)
+USAGE_TAU_DAYS = settings.MACHINE_USAGE_HALF_LIFE_DAYS / math.log(2)
+USAGE_SUMS = ("peso", "soma_t", "soma_h", "soma_tt", "soma_th")
+
+supply_forecasts = sa.table(
+    "supply_forecasts",
+    sa.column("supply_id", sa.Integer),
+    sa.column("consumo_ponderado", sa.Float),
+    sa.column("ultima_saida", sa.DateTime(timezone=True)),
+    sa.column("inicio", sa.DateTime(timezone=True)),
+)
+movements = sa.table(
+    "movements",
+    sa.column("supply_id", sa.Integer),
+    sa.column("tipo", sa.String),
+    sa.column("data", sa.DateTime(timezone=True)),
+)
+machine_forecasts = sa.table(
+    "machine_forecasts",
+    sa.column("machine_id", sa.Integer),
+    sa.column("ultima_leitura", sa.DateTime(timezone=True)),
+    *(sa.column(name, sa.Float) for name in USAGE_SUMS),
+)
+
+
+def _days(value: datetime) -> float:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return (value - EPOCH).total_seconds() / 86400
+
+
+def _safe_exp(value: float) -> float:
+    try:
+        return math.exp(value)
+    except OverflowError:
+        return math.inf
+
+
+def _rescale(direction: int) -> None:
+    # direction -1: da época para a referência (upgrade); +1: o inverso (downgrade)
+    bind = op.get_bind()
+    rows = bind.execute(sa.select(
+        supply_forecasts.c.supply_id, supply_forecasts.c.consumo_ponderado, supply_forecasts.c.ultima_saida
+    )).all()
+    if rows:
+        bind.execute(
+            supply_forecasts.update().where(supply_forecasts.c.supply_id == sa.bindparam("b_id")),
+            [
+                {
+                    "b_id": supply_id,
+                    "consumo_ponderado": consumo * _safe_exp(direction * _days(ultima) / SUPPLY_TAU_DAYS),
+                }
+                for supply_id, consumo, ultima in rows
+            ],
+        )
+
+    rows = bind.execute(
+        sa.select(machine_forecasts).where(machine_forecasts.c.ultima_leitura.is_not(None))
+    ).mappings().all()
+    if rows:
+        bind.execute(
+            machine_forecasts.update().where(machine_forecasts.c.machine_id == sa.bindparam("b_id")),
+            [
+                {
+                    "b_id": row["machine_id"],
+                    **{
+                        name: row[name] * _safe_exp(direction * _days(row["ultima_leitura"]) / USAGE_TAU_DAYS)
+                        for name in USAGE_SUMS
+                    },
+                }
+                for row in rows
+            ],
+        )
+
+
+def upgrade() -> None:
+    if not has_column("supply_forecasts", "ultima_saida"):
+        op.add_column("supply_forecasts", sa.Column("ultima_saida", sa.DateTime(timezone=True)))
+        last_out = (
+            sa.select(sa.func.max(movements.c.data))
+            .where(movements.c.supply_id == supply_forecasts.c.supply_id, movements.c.tipo == "saida")
+            .scalar_subquery()
+        )
+        op.execute(supply_forecasts.update().values(
+            ultima_saida=sa.func.coalesce(last_out, supply_forecasts.c.inicio)
+        ))
+        _rescale(-1)
+        with op.batch_alter_table("supply_forecasts") as batch:
+            batch.alter_column("ultima_saida", existing_type=sa.DateTime(timezone=True), nullable=False)
+
+
+def downgrade() -> None:
+    _rescale(1)
+    with op.batch_alter_table("supply_forecasts") as batch:
+        batch.drop_column("ultima_saida")
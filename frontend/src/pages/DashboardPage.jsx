@@ -4,23 +4,20 @@ import { Link } from 'react-router-dom'
 import api from '../api'
 
 export default function DashboardPage() {
-  const [machines, setMachines] = useState([])
-  const [supplies, setSupplies] = useState([])
+  const [summary, setSummary] = useState(null)
   const [loading, setLoading] = useState(true)
 
   useEffect(() => {
-    Promise.all([api.get('/machines'), api.get('/supplies')])
-      .then(([mRes, sRes]) => {
-        setMachines(mRes.data)
-        setSupplies(sRes.data)
-      })
+    api.get('/dashboard')
+      .then((res) => setSummary(res.data))
       .finally(() => setLoading(false))
   }, [])
 
   if (loading) return <div className="loading">Carregando...</div>
+  if (!summary) return null
 
-  const alertMachines = machines.filter((m) => m.status !== 'OK')
-  const alertSupplies = supplies.filter((s) => s.status !== 'OK')
+  const alertMachines = summary.maquinas_alerta
+  const alertSupplies = summary.insumos_alerta
 
   return (
     <div>
@@ -76,7 +73,7 @@ export default function DashboardPage() {
       </div>
 
       {/* Quick links */}
-      {machines.length === 0 && supplies.length === 0 && (
+      {summary.maquinas.total === 0 && summary.insumos.total === 0 && (
         <div className="empty-state">
           <p>{icons.hand()} Bem-vindo ao Terra em Dia!</p>
           <p style={{ marginTop: 8 }}>
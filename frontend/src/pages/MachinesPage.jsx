@@ -9,6 +9,7 @@ export default function MachinesPage() {
   const [editing, setEditing] = useState(null)
   const [showMaint, setShowMaint] = useState(null)
   const [maintList, setMaintList] = useState([])
+  const [maintCursor, setMaintCursor] = useState(null)
   const [showMaintForm, setShowMaintForm] = useState(false)
 
   const [nome, setNome] = useState('')
@@ -77,6 +78,13 @@ export default function MachinesPage() {
     setShowMaint(machineId)
     const res = await api.get(`/maintenance/${machineId}`)
     setMaintList(res.data)
+    setMaintCursor(res.headers['x-next-cursor'] || null)
+  }
+
+  const loadMoreMaintenance = async () => {
+    const res = await api.get(`/maintenance/${showMaint}`, { params: { cursor: maintCursor } })
+    setMaintList((list) => [...list, ...res.data])
+    setMaintCursor(res.headers['x-next-cursor'] || null)
   }
 
   const handleMaintSubmit = async (e) => {
@@ -174,6 +182,10 @@ export default function MachinesPage() {
             </div>
           ))
         )}
+
+        {maintCursor && (
+          <button className="btn btn-secondary" onClick={loadMoreMaintenance}>Carregar mais</button>
+        )}
       </div>
     )
   }
@@ -9,6 +9,7 @@ export default function SuppliesPage() {
   const [editing, setEditing] = useState(null)
   const [showMovements, setShowMovements] = useState(null)
   const [movementsList, setMovementsList] = useState([])
+  const [movementsCursor, setMovementsCursor] = useState(null)
   const [showMovForm, setShowMovForm] = useState(false)
 
   const [nome, setNome] = useState('')
@@ -68,6 +69,13 @@ export default function SuppliesPage() {
     setShowMovements(supplyId)
     const res = await api.get(`/movements/${supplyId}`)
     setMovementsList(res.data)
+    setMovementsCursor(res.headers['x-next-cursor'] || null)
+  }
+
+  const loadMoreMovements = async () => {
+    const res = await api.get(`/movements/${showMovements}`, { params: { cursor: movementsCursor } })
+    setMovementsList((list) => [...list, ...res.data])
+    setMovementsCursor(res.headers['x-next-cursor'] || null)
   }
 
   const handleMovSubmit = async (e) => {
@@ -127,7 +135,7 @@ export default function SuppliesPage() {
                 </div>
                 <div className="form-group">
                   <label>Quantidade ({supply?.unidade})</label>
-                  <input type="number" step="0.01" value={movQtd} onChange={(e) => setMovQtd(e.target.value)} required />
+                  <input type="number" step="0.01" min="0.01" value={movQtd} onChange={(e) => setMovQtd(e.target.value)} required />
                 </div>
                 <div className="form-group">
                   <label>Observação</label>
@@ -162,6 +170,10 @@ export default function SuppliesPage() {
             </div>
           ))
         )}
+
+        {movementsCursor && (
+          <button className="btn btn-secondary" onClick={loadMoreMovements}>Carregar mais</button>
+        )}
       </div>
     )
   }